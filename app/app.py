@@ -3,6 +3,7 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
+import pyarrow as pa
 from datetime import datetime
 import calendar
 
@@ -15,7 +16,7 @@ st.set_page_config(
 )
 
 # Custom CSS for styling
-st.markdown("""
+CSS_BLOCK = """
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -37,14 +38,20 @@ st.markdown("""
         box-shadow: 0 0.15rem 1.75rem rgba(0, 0, 0, 0.1);
         margin-bottom: 1rem;
     }
-    .metric-value {
+    [data-testid="stMetric"] {
+        padding: 1rem;
+        border-radius: 0.5rem;
+        background-color: #f8f9fa;
+        box-shadow: 0 0.15rem 1.75rem rgba(0, 0, 0, 0.1);
+        margin-bottom: 1rem;
+        text-align: center;
+    }
+    [data-testid="stMetricValue"] {
         font-size: 2rem;
         font-weight: 700;
-        text-align: center;
     }
-    .metric-label {
-        font-size: 1rem;
-        text-align: center;
+    [data-testid="stMetricLabel"] {
+        justify-content: center;
         color: #6c757d;
     }
     .highlight-positive {
@@ -56,7 +63,11 @@ st.markdown("""
         font-weight: 500;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Streamlit drops any element a rerun does not re-emit, so the styles are
+# injected on every run; the markup itself is a module constant
+st.markdown(CSS_BLOCK, unsafe_allow_html=True)
 
 # Main application header
 st.markdown("<h1 class='main-header'>Pine Bar Analytics Dashboard</h1>", unsafe_allow_html=True)
@@ -97,7 +108,88 @@ metric_sort = st.sidebar.selectbox(
     ["Most Sales", "Least Sales", "Most Profit", "Least Profit", "Highest Margin", "Lowest Margin", "Most Orders", "Least Orders"]
 )
 
+# Number formats for st.column_config.NumberColumn
+CURRENCY_FORMAT = "$%.0f"
+PRICE_FORMAT = "$%.2f"
+PERCENT_FORMAT = "%.1f%%"
+
+# Revenue/profit/margin formats shared by the product tables
+PRODUCT_COLUMN_CONFIG = {
+    'Transaction Amount': st.column_config.NumberColumn('Revenue', format=CURRENCY_FORMAT),
+    'Profit': st.column_config.NumberColumn('Profit', format=CURRENCY_FORMAT),
+    'Profit Margin': st.column_config.NumberColumn('Margin', format=PERCENT_FORMAT)
+}
+
+# Function to render a KPI card
+def render_card(value, label):
+    """Render one KPI card as a native st.metric, styled as a card by the page CSS
+    
+    Parameters:
+    value (str): The formatted metric value
+    label (str): The metric label
+    """
+    st.metric(label, value)
+
+# Menu items by category, shared by every period the generator builds
+CATEGORIES = {
+    "BEER": ["Hemlock", "CURRENT CAN", "GANSETT", "N/A BEER", "Return Beer", "SIX POINT", "Vermonter Cider"],
+    "COCKTAILS": ["BEAD & FEATHER", "BLACK MANHATTAN", "CARPETBAGGER", "COCKTAIL OF THE DAY", 
+                 "COCKTAIL SHAKEN", "COCKTAIL STIRRED", "Daiquiri", "Gershwin", "Gimlet", 
+                 "Gin & Sin", "HAITIAN DIVORCE", "HOT DRINX", "Manhattan", "Margarita", 
+                 "Martini Gin", "Martini Vodka", "Negroni", "Old Fashioned", "Open Cocktail", 
+                 "Paper Plane", "Penicillin", "Pineapple Daiq", "pineapple daiquiri", 
+                 "POP-UP COCKTAIL", "Rainy Day Dark And Stormy", "SAZERAC COCKTAIL", 
+                 "SHOOTER", "Soda", "SPRITZ", "TITOS MARTINI", "TONE POLICE"],
+    "FOOD": ["BABA GHANO0USH", "BEEF TARTARE", "BITTER SALAD", "BOQUERONES", "BROWNIE", 
+            "Burger", "CARROTS", "CAVIAR DOG", "CHARRED BEETS", "CHICKEM KEBAB", 
+            "CHX SANDWICH", "CROQUETTES", "Doggie", "DUCK RILLETTES", "EXTRA FOCACCIA", 
+            "Extra Patty", "FALAFEL", "FOCACCIA", "FRENCH FRIES", "Fries", "HANDER STEAK", 
+            "HUMMUS", "LAMB KABAB", "LEEK TOAST", "MEZE PLATTER", "MEZE PLATTY", "PLATTY", 
+            "MOUSSE", "MOZZ STICKS", "MUHAMMARA", "NYE TACOS", "OLIVES AND PICKELS", 
+            "Open Food", "Order note", "Pimento Cheese", "Salad", "SAUSAGE", "SEA TROUT", 
+            "Smash - Vegan Patty", "STEAK FRITES", "SUNCHOKES", "TOSTADA", "TZATZIKI", "VCC"],
+    "SPIRITS": ["AMARGO VALLET", "Amaro", "Balvenie", "Bourbon", "BW WHEAT", "CAMPARI", 
+               "CASCUIN TAHONA", "CURRENT CASSIS", "CYNAR", "EL DORADO 12", "ESPOLON", 
+               "Fernet", "Gin", "Hendricks", "Juice", "Macallan 18", "Makers", "Mezcal", 
+               "Michters", "MONTENEGRO", "NONINO", "OLD FORESTER 100", "Open Spirit", 
+               "Rare Breed", "RITTENHOUSE", "Rum", "SAZERAC", "Scotch", "SHOT 4$", 
+               "SHOT 5$", "SHOT 6$", "SHOT 7$", "SHOT 8$", "SHOT 9$", "Spirit", 
+               "SUZE", "Talisker", "Tequila", "TEREMANA REPOSADO", "Tesoro", "Titos", 
+               "Toki", "TULLY", "Vodka", "Wathen's", "ZACAPA"],
+    "WINE": ["BTL Fizzy", "GLS Fizzy", "GLS Red", "GLS Rose", "GLS White", "OPEN WINE"],
+    "N/A": ["Ginger Beer", "Mock Turtleneck", "POP-UP MOCKTAIL"],
+    "Merch": ["Candle 2 oz", "Candle 9oz", "Misc", "GIFT CERTIFICATE"]
+}
+
+# Fixed categorical dtypes, so every period shares the same integer codes
+# and concatenating periods keeps the columns categorical
+CATEGORY_DTYPE = pd.CategoricalDtype(categories=list(CATEGORIES))
+SKU_DTYPE = pd.CategoricalDtype(categories=[item for items in CATEGORIES.values() for item in items])
+
+# Share of total sales per category, from the business report pie chart
+CATEGORY_WEIGHTS = {
+    "SPIRITS": 0.359,  # 35.9% from the pie chart
+    "FOOD": 0.317,     # 31.7% from the pie chart
+    "COCKTAILS": 0.191, # 19.1% from the pie chart
+    "BEER": 0.069,     # 6.9% from the pie chart (estimated)
+    "WINE": 0.035,     # 3.5% from the pie chart (estimated)
+    "N/A": 0.02,       # 2% from the pie chart (estimated)
+    "Merch": 0.009     # 0.9% from the pie chart (estimated)
+}
+
+# Cost as a fraction of gross sales, (low, high) per category
+COST_FACTOR_RANGES = {
+    "BEER": (0.35, 0.45),
+    "COCKTAILS": (0.25, 0.35),
+    "FOOD": (0.4, 0.55),
+    "SPIRITS": (0.3, 0.4),
+    "WINE": (0.45, 0.55),
+    "N/A": (0.15, 0.25),
+    "Merch": (0.5, 0.7)
+}
+
 # Function to generate data
+@st.cache_data(show_spinner=False)
 def generate_data(option):
     """
     
@@ -107,40 +199,9 @@ def generate_data(option):
     Returns:
     pandas.DataFrame: Generated data
     """
-    # Categories and items
-    categories = {
-        "BEER": ["Hemlock", "CURRENT CAN", "GANSETT", "N/A BEER", "Return Beer", "SIX POINT", "Vermonter Cider"],
-        "COCKTAILS": ["BEAD & FEATHER", "BLACK MANHATTAN", "CARPETBAGGER", "COCKTAIL OF THE DAY", 
-                     "COCKTAIL SHAKEN", "COCKTAIL STIRRED", "Daiquiri", "Gershwin", "Gimlet", 
-                     "Gin & Sin", "HAITIAN DIVORCE", "HOT DRINX", "Manhattan", "Margarita", 
-                     "Martini Gin", "Martini Vodka", "Negroni", "Old Fashioned", "Open Cocktail", 
-                     "Paper Plane", "Penicillin", "Pineapple Daiq", "pineapple daiquiri", 
-                     "POP-UP COCKTAIL", "Rainy Day Dark And Stormy", "SAZERAC COCKTAIL", 
-                     "SHOOTER", "Soda", "SPRITZ", "TITOS MARTINI", "TONE POLICE"],
-        "FOOD": ["BABA GHANO0USH", "BEEF TARTARE", "BITTER SALAD", "BOQUERONES", "BROWNIE", 
-                "Burger", "CARROTS", "CAVIAR DOG", "CHARRED BEETS", "CHICKEM KEBAB", 
-                "CHX SANDWICH", "CROQUETTES", "Doggie", "DUCK RILLETTES", "EXTRA FOCACCIA", 
-                "Extra Patty", "FALAFEL", "FOCACCIA", "FRENCH FRIES", "Fries", "HANDER STEAK", 
-                "HUMMUS", "LAMB KABAB", "LEEK TOAST", "MEZE PLATTER", "MEZE PLATTY", "PLATTY", 
-                "MOUSSE", "MOZZ STICKS", "MUHAMMARA", "NYE TACOS", "OLIVES AND PICKELS", 
-                "Open Food", "Order note", "Pimento Cheese", "Salad", "SAUSAGE", "SEA TROUT", 
-                "Smash - Vegan Patty", "STEAK FRITES", "SUNCHOKES", "TOSTADA", "TZATZIKI", "VCC"],
-        "SPIRITS": ["AMARGO VALLET", "Amaro", "Balvenie", "Bourbon", "BW WHEAT", "CAMPARI", 
-                   "CASCUIN TAHONA", "CURRENT CASSIS", "CYNAR", "EL DORADO 12", "ESPOLON", 
-                   "Fernet", "Gin", "Hendricks", "Juice", "Macallan 18", "Makers", "Mezcal", 
-                   "Michters", "MONTENEGRO", "NONINO", "OLD FORESTER 100", "Open Spirit", 
-                   "Rare Breed", "RITTENHOUSE", "Rum", "SAZERAC", "Scotch", "SHOT 4$", 
-                   "SHOT 5$", "SHOT 6$", "SHOT 7$", "SHOT 8$", "SHOT 9$", "Spirit", 
-                   "SUZE", "Talisker", "Tequila", "TEREMANA REPOSADO", "Tesoro", "Titos", 
-                   "Toki", "TULLY", "Vodka", "Wathen's", "ZACAPA"],
-        "WINE": ["BTL Fizzy", "GLS Fizzy", "GLS Red", "GLS Rose", "GLS White", "OPEN WINE"],
-        "N/A": ["Ginger Beer", "Mock Turtleneck", "POP-UP MOCKTAIL"],
-        "Merch": ["Candle 2 oz", "Candle 9oz", "Misc", "GIFT CERTIFICATE"]
-    }
     
-    # Set random seed based on option for consistent results
+    # Set targets based on option
     if option == "2023 Full Year":
-        np.random.seed(2023)
         n_samples = 150
         year = "2023"
         
@@ -151,7 +212,6 @@ def generate_data(option):
         target_total_sales = 297051.00  # From business report
         
     elif option == "2024 Full Year":
-        np.random.seed(2024)
         n_samples = 180
         year = "2024"
         
@@ -161,7 +221,6 @@ def generate_data(option):
         target_total_sales = 297051.00 * 1.10
         
     else:  # 2025 data (partial year)
-        np.random.seed(2025)
         n_samples = 70
         year = "2025"
         
@@ -170,29 +229,23 @@ def generate_data(option):
         target_net_sales = 281184.00 * 0.30
         target_total_sales = 297051.00 * 0.30
     
+    # Local generator seeded by year for consistent results
+    rng = np.random.default_rng(int(year))
+    
     # Create empty dataframe
     data = []
     
     # Generate synthetic data for each category
     total_generated_amount = 0
-    category_weights = {
-        "SPIRITS": 0.359,  # 35.9% from the pie chart
-        "FOOD": 0.317,     # 31.7% from the pie chart
-        "COCKTAILS": 0.191, # 19.1% from the pie chart
-        "BEER": 0.069,     # 6.9% from the pie chart (estimated)
-        "WINE": 0.035,     # 3.5% from the pie chart (estimated)
-        "N/A": 0.02,       # 2% from the pie chart (estimated)
-        "Merch": 0.009     # 0.9% from the pie chart (estimated)
-    }
     
-    for category, items in categories.items():
+    for category, items in CATEGORIES.items():
         # Calculate target amount for this category based on weights
-        category_target = target_total_sales * category_weights[category]
+        category_target = target_total_sales * CATEGORY_WEIGHTS[category]
         
         # Generate realistic items for this category
         valid_items = []
         for item in items:
-            if np.random.random() > 0.3:  # Only include some items
+            if rng.random() > 0.3:  # Only include some items
                 valid_items.append(item)
         
         # Distribute the category target amount among items
@@ -217,56 +270,36 @@ def generate_data(option):
                 total_amount = category_target * normalized_weight
                 
                 # Add some randomness but keep around target
-                total_amount = total_amount * (0.9 + 0.2 * np.random.random())
+                total_amount = total_amount * (0.9 + 0.2 * rng.random())
                 total_generated_amount += total_amount
                 
                 # Calculate other metrics
-                total_quantity = np.random.randint(10, int(total_amount / 20) + 1)
-                transaction_count = np.random.randint(5, min(200, total_quantity + 1))
+                total_quantity = rng.integers(10, int(total_amount / 20) + 1)
+                transaction_count = rng.integers(5, min(200, total_quantity + 1))
                 
                 # Calculate other metrics based on total
-                zero_priced = np.random.randint(0, int(total_quantity * 0.05) + 1)
-                disc_amount = -np.random.randint(0, int(total_amount * 0.15) + 1) if np.random.random() > 0.3 else 0
-                disc_quantity = np.random.randint(0, int(total_quantity * 0.15) + 1) if disc_amount < 0 else 0
-                disc_transactions = np.random.randint(0, min(50, disc_quantity + 1)) if disc_quantity > 0 else 0
+                zero_priced = rng.integers(0, int(total_quantity * 0.05) + 1)
+                disc_amount = -rng.integers(0, int(total_amount * 0.15) + 1) if rng.random() > 0.3 else 0
+                disc_quantity = rng.integers(0, int(total_quantity * 0.15) + 1) if disc_amount < 0 else 0
+                disc_transactions = rng.integers(0, min(50, disc_quantity + 1)) if disc_quantity > 0 else 0
                 
-                offered_amount = np.random.randint(0, int(total_amount * 0.1) + 1) if np.random.random() > 0.7 else 0
-                offered_quantity = np.random.randint(0, int(total_quantity * 0.05) + 1) if offered_amount > 0 else 0
-                offered_transactions = np.random.randint(0, min(20, offered_quantity + 1)) if offered_quantity > 0 else 0
+                offered_amount = rng.integers(0, int(total_amount * 0.1) + 1) if rng.random() > 0.7 else 0
+                offered_quantity = rng.integers(0, int(total_quantity * 0.05) + 1) if offered_amount > 0 else 0
+                offered_transactions = rng.integers(0, min(20, offered_quantity + 1)) if offered_quantity > 0 else 0
                 
-                loss_amount = -np.random.randint(0, int(total_amount * 0.1) + 1) if np.random.random() > 0.8 else 0
-                loss_quantity = np.random.randint(0, int(total_quantity * 0.05) + 1) if loss_amount < 0 else 0
-                loss_transactions = np.random.randint(0, min(10, loss_quantity + 1)) if loss_quantity > 0 else 0
+                loss_amount = -rng.integers(0, int(total_amount * 0.1) + 1) if rng.random() > 0.8 else 0
+                loss_quantity = rng.integers(0, int(total_quantity * 0.05) + 1) if loss_amount < 0 else 0
+                loss_transactions = rng.integers(0, min(10, loss_quantity + 1)) if loss_quantity > 0 else 0
                 
-                returned_amount = -np.random.randint(0, int(total_amount * 0.05) + 1) if np.random.random() > 0.85 else 0
-                returned_quantity = np.random.randint(0, int(total_quantity * 0.03) + 1) if returned_amount < 0 else 0
-                returned_transactions = np.random.randint(0, min(5, returned_quantity + 1)) if returned_quantity > 0 else 0
+                returned_amount = -rng.integers(0, int(total_amount * 0.05) + 1) if rng.random() > 0.85 else 0
+                returned_quantity = rng.integers(0, int(total_quantity * 0.03) + 1) if returned_amount < 0 else 0
+                returned_transactions = rng.integers(0, min(5, returned_quantity + 1)) if returned_quantity > 0 else 0
                 
                 # Calculate final transaction values
                 transaction_amount = total_amount + disc_amount + offered_amount + loss_amount + returned_amount
                 transaction_quantity = total_quantity - zero_priced - disc_quantity - offered_quantity - loss_quantity - returned_quantity
                 if transaction_quantity < 0: transaction_quantity = 0
                 
-                # Cost and profit
-                if category == "BEER":
-                    cost_factor = 0.35 + np.random.random() * 0.1  # 35-45%
-                elif category == "COCKTAILS":
-                    cost_factor = 0.25 + np.random.random() * 0.1  # 25-35%
-                elif category == "FOOD":
-                    cost_factor = 0.4 + np.random.random() * 0.15  # 40-55%
-                elif category == "SPIRITS":
-                    cost_factor = 0.3 + np.random.random() * 0.1  # 30-40%
-                elif category == "WINE":
-                    cost_factor = 0.45 + np.random.random() * 0.1  # 45-55%
-                elif category == "N/A":
-                    cost_factor = 0.15 + np.random.random() * 0.1  # 15-25%
-                elif category == "Merch":
-                    cost_factor = 0.5 + np.random.random() * 0.2  # 50-70%
-                
-                cost = total_amount * cost_factor
-                profit = transaction_amount - cost
-                profit_margin = (profit / transaction_amount * 100) if transaction_amount > 0 else 0
-                
                 data.append({
                     "SKU": item, 
                     "Category": category, 
@@ -289,14 +322,18 @@ def generate_data(option):
                     "Transaction Amount": transaction_amount, 
                     "Transaction Quantity": transaction_quantity, 
                     "Transaction Count": transaction_count,
-                    "Cost": cost, 
-                    "Profit": profit,
-                    "Profit Margin": profit_margin,
                     "Year": year
                 })
     
     df = pd.DataFrame(data)
     
+    # Cost and profit for every row at once: look up each category's cost factor
+    # range and draw the factor within it with one vectorized random call
+    factor_range = pd.DataFrame(COST_FACTOR_RANGES, index=['low', 'high']).T.reindex(df['Category']).to_numpy()
+    cost_factor = factor_range[:, 0] + rng.random(len(df)) * (factor_range[:, 1] - factor_range[:, 0])
+    df['Cost'] = df['Total Amount'].to_numpy() * cost_factor
+    df['Profit'] = df['Transaction Amount'].to_numpy() - df['Cost'].to_numpy()
+    
     # Scale the data to match target revenue
     current_total = df['Transaction Amount'].sum()
     scaling_factor = target_total_sales / current_total
@@ -309,11 +346,285 @@ def generate_data(option):
     for col in columns_to_scale:
         df[col] = df[col] * scaling_factor
     
-    # Recalculate profit margin
-    df['Profit Margin'] = (df['Profit'] / df['Transaction Amount'] * 100)
+    # Recalculate profit margin, 0 where there was no revenue
+    amount = df['Transaction Amount'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['Profit Margin'] = np.where(amount > 0, df['Profit'].to_numpy() / amount * 100, 0.0)
+    
+    # Categorical keys let groupby and isin work on integer codes
+    df['Category'] = df['Category'].astype(CATEGORY_DTYPE)
+    df['SKU'] = df['SKU'].astype(SKU_DTYPE)
+    df['Year'] = df['Year'].astype('category')
+    
+    # Downcast the hot numeric columns to halve the bytes every reduction reads;
+    # counts use int32 like the root generator, wide enough for any arithmetic on them
+    for col in ['Transaction Amount', 'Profit', 'Profit Margin']:
+        df[col] = df[col].astype('float32')
+    for col in ['Transaction Count', 'Transaction Quantity']:
+        df[col] = df[col].astype('int32')
+    
+    return df
+
+# Function to load every period for comparison
+@st.cache_data(show_spinner=False)
+def load_all_time():
+    """Combine the data for every period into one dataframe
+    
+    Returns:
+    pandas.DataFrame: Combined data for all periods
+    """
+    df = pd.concat([generate_data(option) for option in data_files], ignore_index=True)
+    
+    # Category and SKU share fixed dtypes across periods; each period has its own Year
+    # category, so concat falls back to object dtype for that column only
+    return df.astype({'Year': 'category'})
+
+# Function to prepare categorical keys for Plotly Express
+def plain_labels(df):
+    """Convert the categorical key columns back to plain string labels
+    
+    Plotly Express groups color and path columns without observed=True, which
+    fails on categoricals that carry unused categories.
+    
+    Parameters:
+    df (pandas.DataFrame): Small (already aggregated or selected) frame to plot
+    
+    Returns:
+    pandas.DataFrame: Frame with string Category/SKU columns
+    """
+    return df.astype({col: str for col in ('Category', 'SKU') if col in df.columns})
+
+# Function to hash dataframes passed to cached helpers
+def hash_dataframe(df):
+    """Cheap content signature used as the st.cache_data key for dataframes
+    
+    The key is content-based: column names plus the summed row hashes of the
+    values, ignoring the index and row order.
+    
+    Parameters:
+    df (pandas.DataFrame): The dataframe to hash
+    
+    Returns:
+    tuple: Shape, columns and summed row hashes of the dataframe
+    """
+    return df.shape, tuple(df.columns), int(pd.util.hash_pandas_object(df, index=False).sum())
+
+DATAFRAME_HASH_FUNCS = {pd.DataFrame: hash_dataframe}
+
+# Function to load the data for a period with the category filter applied
+@st.cache_data(show_spinner=False)
+def load_filtered_data(option, categories):
+    """Load the data for a period and apply the category filter
+    
+    Parameters:
+    option (str): Data period option, including "All Time Comparison"
+    categories (tuple): Selected categories; "All" keeps every category
+    
+    Returns:
+    pandas.DataFrame: Filtered data
+    """
+    if option == "All Time Comparison":
+        df = load_all_time()
+    else:
+        df = generate_data(option)
+    
+    if "All" not in categories:
+        # Compare the integer category codes instead of the labels
+        wanted = df['Category'].cat.categories.get_indexer(categories)
+        df = df[np.isin(df['Category'].cat.codes.to_numpy(), wanted)]
     
     return df
 
+# Function to aggregate sales and margin statistics by category
+@st.cache_data(show_spinner=False, hash_funcs=DATAFRAME_HASH_FUNCS)
+def aggregate_by_category(df):
+    """Aggregate sales totals and profit margin statistics by category in one pass
+    
+    The category codes are factorized once and every statistic is accumulated
+    with NumPy (bincount for sums, ufunc.at for min/max), so each column is
+    scanned a single time instead of once per pandas aggregation.
+    
+    Parameters:
+    df (pandas.DataFrame): The data to aggregate
+    
+    Returns:
+    pandas.DataFrame: Per-category totals and margin statistics, shared by the views
+    """
+    # Codes in order of first appearance, matching groupby(sort=False, observed=True)
+    codes, categories = pd.factorize(df['Category'], sort=False)
+    n_groups = len(categories)
+    counts = np.bincount(codes, minlength=n_groups)
+    
+    result = {'Category': categories}
+    for col in ['Transaction Amount', 'Transaction Count', 'Transaction Quantity', 'Profit']:
+        values = df[col].to_numpy()
+        # bincount accumulates in float64; integer totals are widened to int64 so
+        # downcast counts cannot overflow once summed
+        totals = np.bincount(codes, weights=values, minlength=n_groups)
+        result[col] = totals.astype(np.int64 if values.dtype.kind in 'iu' else values.dtype)
+    
+    margins = df['Profit Margin'].to_numpy(dtype=float)
+    margin_sum = np.bincount(codes, weights=margins, minlength=n_groups)
+    margin_sq_sum = np.bincount(codes, weights=margins * margins, minlength=n_groups)
+    min_margin = np.full(n_groups, np.inf)
+    max_margin = np.full(n_groups, -np.inf)
+    np.minimum.at(min_margin, codes, margins)
+    np.maximum.at(max_margin, codes, margins)
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_margin = margin_sum / counts
+        # Sample variance (ddof=1) from the running sums; NaN for single-row groups like pandas
+        variance = (margin_sq_sum - margin_sum * avg_margin) / (counts - 1)
+    margin_std = np.where(counts > 1, np.sqrt(np.clip(variance, 0, None)), np.nan)
+    
+    result['Avg Margin'] = avg_margin
+    result['Min Margin'] = min_margin
+    result['Max Margin'] = max_margin
+    result['Margin StdDev'] = margin_std
+    return pd.DataFrame(result)
+
+# Function to aggregate sales by year
+@st.cache_data(show_spinner=False, hash_funcs=DATAFRAME_HASH_FUNCS)
+def aggregate_by_year(df):
+    """Aggregate revenue, orders and profit by year
+    
+    Parameters:
+    df (pandas.DataFrame): The data to aggregate
+    
+    Returns:
+    pandas.DataFrame: Yearly totals
+    """
+    return df.groupby('Year', observed=True).agg({
+        'Transaction Amount': 'sum',
+        'Transaction Count': 'sum',
+        'Profit': 'sum'
+    }).reset_index()
+
+# Function to aggregate sales by product
+@st.cache_data(show_spinner=False, hash_funcs=DATAFRAME_HASH_FUNCS)
+def aggregate_by_product(df):
+    """Aggregate revenue, orders and profit to one row per (Category, SKU)
+    
+    Parameters:
+    df (pandas.DataFrame): The data to aggregate
+    
+    Returns:
+    pandas.DataFrame: Per-product totals and margin with plain string labels, ready for Plotly
+    """
+    product_sales = df.groupby(['Category', 'SKU'], sort=False, observed=True).agg(**{
+        'Transaction Amount': ('Transaction Amount', 'sum'),
+        'Transaction Count': ('Transaction Count', 'sum'),
+        'Profit': ('Profit', 'sum')
+    }).reset_index()
+    
+    # Margin of the summed totals, so products spanning several periods are weighted by revenue
+    amount = product_sales['Transaction Amount'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        product_sales['Profit Margin'] = np.where(amount > 0, product_sales['Profit'].to_numpy() / amount * 100, 0.0)
+    return plain_labels(product_sales)
+
+# Function to compute the low/high profit margin thresholds
+def compute_margin_quantiles(df):
+    """Compute the 10th and 90th percentile profit margins
+    
+    Parameters:
+    df (pandas.DataFrame): The data to analyze
+    
+    Returns:
+    tuple: (low margin threshold, high margin threshold)
+    """
+    low_margin_threshold, high_margin_threshold = df['Profit Margin'].quantile([0.1, 0.9]).to_numpy()
+    return low_margin_threshold, high_margin_threshold
+
+# Function to build the margin distribution box plot
+@st.cache_data(show_spinner=False, hash_funcs=DATAFRAME_HASH_FUNCS)
+def build_margin_box(df, category_order):
+    """Build the profit margin box plot, cached so reruns with the same data skip trace assembly
+    
+    Parameters:
+    df (pandas.DataFrame): The data to plot
+    category_order (tuple): Category labels in display order
+    
+    Returns:
+    plotly.graph_objects.Figure: The box plot
+    """
+    # Create a box plot for margin distribution, one colored trace per category;
+    # a single groupby pass gives every category's row positions (unsorted, since
+    # the traces follow category_order)
+    fig = go.Figure()
+    
+    margins = df['Profit Margin'].to_numpy()
+    positions = df.groupby('Category', observed=True, sort=False).indices
+    
+    for category in category_order:
+        fig.add_trace(go.Box(
+            y=margins[positions[category]],
+            name=category,
+            boxmean=True
+        ))
+    
+    fig.update_layout(
+        title='Profit Margin Distribution by Category',
+        yaxis_title='Profit Margin (%)',
+        showlegend=True
+    )
+    
+    return fig
+
+# Function to build the normalized sales comparison chart
+@st.cache_data(show_spinner=False, hash_funcs=DATAFRAME_HASH_FUNCS)
+def build_sales_comparison(category_sales):
+    """Build the normalized revenue/quantity/orders bar chart from the category aggregate
+    
+    Parameters:
+    category_sales (pandas.DataFrame): Per-category totals from aggregate_by_category
+    
+    Returns:
+    plotly.graph_objects.Figure: The grouped bar chart
+    """
+    # Create stacked bar chart for comparison of revenue, quantity and orders
+    fig = go.Figure()
+    
+    # Normalize revenue, quantity and orders to percentages in one array operation
+    volumes = category_sales[['Transaction Amount', 'Transaction Quantity', 'Transaction Count']].to_numpy(dtype=float)
+    normalized = volumes / volumes.sum(axis=0) * 100
+    
+    # Order the axis by revenue with an argsort instead of sorting the frame
+    revenue_order = category_sales['Category'].to_numpy()[np.argsort(-volumes[:, 0], kind='stable')]
+    
+    fig.add_trace(go.Bar(
+        x=category_sales['Category'],
+        y=normalized[:, 0],
+        name='Revenue',
+        marker_color='#3498db'
+    ))
+    
+    fig.add_trace(go.Bar(
+        x=category_sales['Category'],
+        y=normalized[:, 1],
+        name='Quantity',
+        marker_color='#2ecc71'
+    ))
+    
+    fig.add_trace(go.Bar(
+        x=category_sales['Category'],
+        y=normalized[:, 2],
+        name='Orders',
+        marker_color='#e74c3c'
+    ))
+    
+    fig.update_layout(
+        title='Revenue, Quantity, and Orders by Category (Normalized %)',
+        xaxis_title='Category',
+        yaxis_title='Percentage (%)',
+        barmode='group',
+        bargap=0.15,
+        bargroupgap=0.1,
+        xaxis={'categoryorder': 'array', 'categoryarray': revenue_order.tolist()}
+    )
+    
+    return fig
+
 # Function to create metrics row
 def create_metrics_row(df):
     """Create a row of key metrics cards
@@ -321,39 +632,29 @@ def create_metrics_row(df):
     Parameters:
     df (pandas.DataFrame): The data to display metrics for
     """
+    # Column totals in one NumPy pass, reused by the cards
+    total_revenue, total_profit, total_orders = (
+        df[['Transaction Amount', 'Profit', 'Transaction Count']].to_numpy(dtype=float).sum(axis=0)
+    )
+    
     col1, col2, col3, col4, col5 = st.columns(5)
     
     with col1:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>${df['Transaction Amount'].sum():,.0f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Total Revenue</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        render_card(f"${total_revenue:,.0f}", "Total Revenue")
     
     with col2:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>${df['Profit'].sum():,.0f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Total Profit</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        render_card(f"${total_profit:,.0f}", "Total Profit")
     
     with col3:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>{df['Transaction Count'].sum():,.0f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Total Orders</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        render_card(f"{total_orders:,.0f}", "Total Orders")
     
     with col4:
-        profit_margin = (df['Profit'].sum() / df['Transaction Amount'].sum() * 100) if df['Transaction Amount'].sum() > 0 else 0
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>{profit_margin:.1f}%</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Overall Margin</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        profit_margin = (total_profit / total_revenue * 100) if total_revenue > 0 else 0
+        render_card(f"{profit_margin:.1f}%", "Overall Margin")
     
     with col5:
-        avg_order = df['Transaction Amount'].sum() / df['Transaction Count'].sum() if df['Transaction Count'].sum() > 0 else 0
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>${avg_order:.2f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Avg Order Value</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        avg_order = total_revenue / total_orders if total_orders > 0 else 0
+        render_card(f"${avg_order:.2f}", "Avg Order Value")
 
 # Function to create category breakdown
 def create_category_breakdown(df):
@@ -364,13 +665,9 @@ def create_category_breakdown(df):
     """
     st.markdown("<h2 class='sub-header'>Category Overview</h2>", unsafe_allow_html=True)
     
-    # Group by category
-    category_sales = df.groupby('Category').agg({
-        'Transaction Amount': 'sum',
-        'Transaction Count': 'sum',
-        'Profit': 'sum',
-        'Cost': 'sum'
-    }).reset_index()
+    # Group by category over only the summed columns
+    sum_cols = ['Transaction Amount', 'Transaction Count', 'Profit', 'Cost']
+    category_sales = df[['Category'] + sum_cols].groupby('Category', observed=True).sum().reset_index()
     
     # Calculate profit margin percentage for each category
     category_sales['Profit Margin'] = (category_sales['Profit'] / category_sales['Transaction Amount'] * 100).round(1)
@@ -389,16 +686,17 @@ def create_category_breakdown(df):
     )
     fig1.update_traces(textposition='inside', textinfo='percent+label')
     
-    # Create horizontal bar chart for category profit
+    # Create horizontal bar chart for category profit (sorted once, reused for the labels)
+    sorted_by_profit = category_sales.sort_values('Profit', ascending=True)
     fig2 = px.bar(
-        category_sales.sort_values('Profit', ascending=True),
+        sorted_by_profit,
         x='Profit',
         y='Category',
         title='Profit by Category',
         orientation='h',
         color='Profit Margin',
         color_continuous_scale='Viridis',
-        text=category_sales.sort_values('Profit', ascending=True)['Profit'].apply(lambda x: f"${x:,.0f}")
+        text=sorted_by_profit['Profit'].map("${:,.0f}".format)
     )
     fig2.update_traces(textposition='outside')
     
@@ -413,16 +711,21 @@ def create_category_breakdown(df):
     # Category metrics
     st.markdown("<h3 class='sub-header'>Category Performance Metrics</h3>", unsafe_allow_html=True)
     
-    # Format the DataFrame for display
-    display_df = category_sales.copy()
-    display_df['Revenue'] = display_df['Transaction Amount'].apply(lambda x: f"${x:,.0f}")
-    display_df['Profit'] = display_df['Profit'].apply(lambda x: f"${x:,.0f}")
-    display_df['Margin'] = display_df['Profit Margin'].apply(lambda x: f"{x:.1f}%")
-    display_df['Orders'] = display_df['Transaction Count'].apply(lambda x: f"{x:,.0f}")
-    display_df['Avg Order Value'] = (display_df['Transaction Amount'] / display_df['Transaction Count']).apply(lambda x: f"${x:.2f}")
-    
-    # Display the formatted DataFrame
-    st.dataframe(display_df[['Category', 'Revenue', 'Profit', 'Margin', 'Orders', 'Avg Order Value']], use_container_width=True)
+    # Display the numeric aggregate directly; formatting is applied by column_config
+    category_sales['Avg Order Value'] = category_sales['Transaction Amount'] / category_sales['Transaction Count']
+    display_cols = ['Category', 'Transaction Amount', 'Profit', 'Profit Margin', 'Transaction Count', 'Avg Order Value']
+    
+    st.dataframe(
+        pa.Table.from_pandas(category_sales[display_cols], preserve_index=False),
+        column_config={
+            'Transaction Amount': st.column_config.NumberColumn('Revenue', format=CURRENCY_FORMAT),
+            'Profit': st.column_config.NumberColumn('Profit', format=CURRENCY_FORMAT),
+            'Profit Margin': st.column_config.NumberColumn('Margin', format=PERCENT_FORMAT),
+            'Transaction Count': st.column_config.NumberColumn('Orders', format="%d"),
+            'Avg Order Value': st.column_config.NumberColumn('Avg Order Value', format=PRICE_FORMAT)
+        },
+        use_container_width=True
+    )
 
 # Function to create category performance
 def create_category_performance(df):
@@ -433,8 +736,9 @@ def create_category_performance(df):
     """
     st.markdown("<h2 class='sub-header'>Category Performance Analysis</h2>", unsafe_allow_html=True)
     
-    # Group by category
-    category_performance = df.groupby('Category').agg({
+    # Group by category over only the aggregated columns
+    perf_cols = ['Category', 'Transaction Amount', 'Transaction Count', 'Transaction Quantity', 'Profit', 'Cost', 'SKU']
+    category_performance = df[perf_cols].groupby('Category', observed=True).agg({
         'Transaction Amount': 'sum',
         'Transaction Count': 'sum',
         'Transaction Quantity': 'sum',
@@ -452,7 +756,7 @@ def create_category_performance(df):
     category_performance['Profit Share'] = (category_performance['Profit'] / df['Profit'].sum() * 100).round(1)
     
     # Sort by revenue
-    category_performance = category_performance.sort_values('Transaction Amount', ascending=False)
+    category_performance = plain_labels(category_performance.sort_values('Transaction Amount', ascending=False))
     
     # Create comparison bar chart
     fig = px.bar(
@@ -499,22 +803,47 @@ def create_category_performance(df):
     # Format the DataFrame for display
     st.markdown("<h3>Detailed Category Metrics</h3>", unsafe_allow_html=True)
     
-    display_df = category_performance.copy()
-    display_df['Revenue'] = display_df['Transaction Amount'].apply(lambda x: f"${x:,.0f}")
-    display_df['Profit'] = display_df['Profit'].apply(lambda x: f"${x:,.0f}")
-    display_df['Margin'] = display_df['Profit Margin'].apply(lambda x: f"{x:.1f}%")
-    display_df['Orders'] = display_df['Transaction Count'].apply(lambda x: f"{x:,.0f}")
-    display_df['Items'] = display_df['Transaction Quantity'].apply(lambda x: f"{x:,.0f}")
-    display_df['Products'] = display_df['SKU']
-    display_df['Avg Order'] = display_df['Avg Order Value'].apply(lambda x: f"${x:.2f}")
-    display_df['Rev/Item'] = display_df['Revenue Per Item'].apply(lambda x: f"${x:.2f}")
-    display_df['Rev Share'] = display_df['Revenue Share'].apply(lambda x: f"{x:.1f}%")
-    display_df['Profit Share'] = display_df['Profit Share'].apply(lambda x: f"{x:.1f}%")
-    
-    cols_to_display = ['Category', 'Revenue', 'Profit', 'Margin', 'Orders', 'Items', 
-                       'Products', 'Avg Order', 'Rev/Item', 'Rev Share', 'Profit Share']
-    
-    st.dataframe(display_df[cols_to_display], use_container_width=True)
+    # Numeric columns are formatted by column_config
+    cols_to_display = ['Category', 'Transaction Amount', 'Profit', 'Profit Margin', 'Transaction Count',
+                       'Transaction Quantity', 'SKU', 'Avg Order Value', 'Revenue Per Item',
+                       'Revenue Share', 'Profit Share']
+    
+    st.dataframe(
+        pa.Table.from_pandas(category_performance[cols_to_display], preserve_index=False),
+        column_config={
+            'Transaction Amount': st.column_config.NumberColumn('Revenue', format=CURRENCY_FORMAT),
+            'Profit': st.column_config.NumberColumn('Profit', format=CURRENCY_FORMAT),
+            'Profit Margin': st.column_config.NumberColumn('Margin', format=PERCENT_FORMAT),
+            'Transaction Count': st.column_config.NumberColumn('Orders', format="%d"),
+            'Transaction Quantity': st.column_config.NumberColumn('Items', format="%d"),
+            'SKU': st.column_config.NumberColumn('Products', format="%d"),
+            'Avg Order Value': st.column_config.NumberColumn('Avg Order', format=PRICE_FORMAT),
+            'Revenue Per Item': st.column_config.NumberColumn('Rev/Item', format=PRICE_FORMAT),
+            'Revenue Share': st.column_config.NumberColumn('Rev Share', format=PERCENT_FORMAT),
+            'Profit Share': st.column_config.NumberColumn('Profit Share', format=PERCENT_FORMAT)
+        },
+        use_container_width=True
+    )
+
+# Product sort options: (metric, direction, chart title, color column)
+PRODUCT_SORT_OPTIONS = {
+    "Most Sales": ('Transaction Amount', 'largest', 'Top 10 Products by Sales', 'Category'),
+    "Least Sales": ('Transaction Amount', 'smallest', 'Bottom 10 Products by Sales', 'Category'),
+    "Most Profit": ('Profit', 'largest', 'Top 10 Products by Profit', 'Category'),
+    "Least Profit": ('Profit', 'smallest', 'Bottom 10 Products by Profit', 'Category'),
+    "Highest Margin": ('Profit Margin', 'largest', 'Top 10 Products by Profit Margin', 'Profit Margin'),
+    "Lowest Margin": ('Profit Margin', 'smallest', 'Bottom 10 Products by Profit Margin', 'Profit Margin'),
+    "Most Orders": ('Transaction Count', 'largest', 'Top 10 Products by Order Count', 'Category'),
+    "Least Orders": ('Transaction Count', 'smallest', 'Bottom 10 Products by Order Count', 'Category')
+}
+
+# Bar label formats for each product metric
+METRIC_LABEL_FORMATS = {
+    'Transaction Amount': "${:,.0f}",
+    'Profit': "${:,.0f}",
+    'Profit Margin': "{:.1f}%",
+    'Transaction Count': "{:.0f}"
+}
 
 # Function to create product performance analysis
 def create_product_performance(df, metric_sort):
@@ -526,117 +855,94 @@ def create_product_performance(df, metric_sort):
     """
     st.markdown("<h2 class='sub-header'>Product Performance</h2>", unsafe_allow_html=True)
     
-    # Determine sorting based on selected option
-    if metric_sort == "Most Sales":
-        df_sorted = df.sort_values('Transaction Amount', ascending=False).head(10)
-        metric = 'Transaction Amount'
-        title = 'Top 10 Products by Sales'
-        color_values = 'Category'
-    elif metric_sort == "Least Sales":
-        df_sorted = df.sort_values('Transaction Amount', ascending=True).head(10)
-        metric = 'Transaction Amount'
-        title = 'Bottom 10 Products by Sales'
-        color_values = 'Category'
-    elif metric_sort == "Most Profit":
-        df_sorted = df.sort_values('Profit', ascending=False).head(10)
-        metric = 'Profit'
-        title = 'Top 10 Products by Profit'
-        color_values = 'Category'
-    elif metric_sort == "Least Profit":
-        df_sorted = df.sort_values('Profit', ascending=True).head(10)
-        metric = 'Profit'
-        title = 'Bottom 10 Products by Profit'
-        color_values = 'Category'
-    elif metric_sort == "Highest Margin":
-        df_sorted = df.sort_values('Profit Margin', ascending=False).head(10)
-        metric = 'Profit Margin'
-        title = 'Top 10 Products by Profit Margin'
-        color_values = 'Profit Margin'
-    elif metric_sort == "Lowest Margin":
-        df_sorted = df.sort_values('Profit Margin', ascending=True).head(10)
-        metric = 'Profit Margin'
-        title = 'Bottom 10 Products by Profit Margin'
-        color_values = 'Profit Margin'
-    elif metric_sort == "Most Orders":
-        df_sorted = df.sort_values('Transaction Count', ascending=False).head(10)
-        metric = 'Transaction Count'
-        title = 'Top 10 Products by Order Count'
-        color_values = 'Category'
-    else:  # Least Orders
-        df_sorted = df.sort_values('Transaction Count', ascending=True).head(10)
-        metric = 'Transaction Count'
-        title = 'Bottom 10 Products by Order Count'
-        color_values = 'Category'
+    # Rank products on their totals (cached), so a SKU sold in several periods
+    # appears once, and only one row per product is sorted
+    product_sales = aggregate_by_product(df)
+    
+    # Select the top/bottom 10 products for the selected option
+    metric, direction, title, color_values = PRODUCT_SORT_OPTIONS[metric_sort]
+    if direction == 'largest':
+        df_sorted = product_sales.nlargest(10, metric)
+    else:
+        df_sorted = product_sales.nsmallest(10, metric)
     
     # Create horizontal bar chart
-    if metric == 'Profit Margin':
-        fig = px.bar(
-            df_sorted,
-            x=metric,
-            y='SKU',
-            title=title,
-            orientation='h',
-            color=color_values,
-            text=df_sorted[metric].apply(lambda x: f"{x:.1f}%"),
-            color_continuous_scale='Viridis',
-            hover_data=['Category', 'Transaction Amount', 'Profit']
-        )
-        fig.update_traces(textposition='outside')
-    elif metric == 'Transaction Count':
-        fig = px.bar(
-            df_sorted,
-            x=metric,
-            y='SKU',
-            title=title,
-            orientation='h',
-            color=color_values,
-            text=df_sorted[metric],
-            color_discrete_sequence=px.colors.qualitative.Bold,
-            hover_data=['Category', 'Transaction Amount', 'Profit']
-        )
-        fig.update_traces(textposition='outside')
+    if metric in ('Transaction Amount', 'Profit'):
+        hover_cols = ['Category', 'Transaction Count', 'Profit Margin']
     else:
-        fig = px.bar(
-            df_sorted,
-            x=metric,
-            y='SKU',
-            title=title,
-            orientation='h',
-            color=color_values,
-            text=df_sorted[metric].apply(lambda x: f"${x:,.0f}"),
-            color_discrete_sequence=px.colors.qualitative.Bold,
-            hover_data=['Category', 'Transaction Count', 'Profit Margin']
-        )
-        fig.update_traces(textposition='outside')
+        hover_cols = ['Category', 'Transaction Amount', 'Profit']
+    
+    fig = px.bar(
+        df_sorted,
+        x=metric,
+        y='SKU',
+        title=title,
+        orientation='h',
+        color=color_values,
+        text=df_sorted[metric].map(METRIC_LABEL_FORMATS[metric].format),
+        color_continuous_scale='Viridis',
+        color_discrete_sequence=px.colors.qualitative.Bold,
+        hover_data=hover_cols
+    )
+    fig.update_traces(textposition='outside')
     
     st.plotly_chart(fig, use_container_width=True)
     
     # Display the data table
     with st.expander("View Detailed Product Data"):
-        # Format columns for display
-        display_df = df_sorted.copy()
-        display_df['Revenue'] = display_df['Transaction Amount'].apply(lambda x: f"${x:,.0f}")
-        display_df['Profit'] = display_df['Profit'].apply(lambda x: f"${x:,.0f}")
-        display_df['Margin'] = display_df['Profit Margin'].apply(lambda x: f"{x:.1f}%")
-        display_df['Orders'] = display_df['Transaction Count']
-        display_df['Avg Order Value'] = (display_df['Transaction Amount'] / display_df['Transaction Count']).apply(lambda x: f"${x:.2f}")
+        # Numeric columns are formatted by column_config
+        display_df = df_sorted[['SKU', 'Category', 'Transaction Amount', 'Profit', 'Profit Margin', 'Transaction Count']].copy()
+        display_df['Avg Order Value'] = display_df['Transaction Amount'] / display_df['Transaction Count']
         
-        st.dataframe(display_df[['SKU', 'Category', 'Revenue', 'Profit', 'Margin', 'Orders', 'Avg Order Value']], use_container_width=True)
+        st.dataframe(
+            pa.Table.from_pandas(display_df, preserve_index=False),
+            column_config={
+                **PRODUCT_COLUMN_CONFIG,
+                'Transaction Count': st.column_config.NumberColumn('Orders', format="%d"),
+                'Avg Order Value': st.column_config.NumberColumn('Avg Order Value', format=PRICE_FORMAT)
+            },
+            use_container_width=True
+        )
     
     # Additional product insights
     st.markdown("<h3>Product Insights</h3>", unsafe_allow_html=True)
     
-    # Get top product within each category
-    top_by_category = df.sort_values('Transaction Amount', ascending=False).groupby('Category').first().reset_index()
-    
-    # Format for display
-    top_category_df = top_by_category.copy()
-    top_category_df['Revenue'] = top_category_df['Transaction Amount'].apply(lambda x: f"${x:,.0f}")
-    top_category_df['Profit'] = top_category_df['Profit'].apply(lambda x: f"${x:,.0f}")
-    top_category_df['Margin'] = top_category_df['Profit Margin'].apply(lambda x: f"{x:.1f}%")
+    # Get top product within each category from the per-product totals
+    top_idx = product_sales.groupby('Category', sort=False)['Transaction Amount'].idxmax()
+    top_by_category = product_sales.loc[top_idx]
     
     with st.expander("Top Selling Product by Category"):
-        st.dataframe(top_category_df[['Category', 'SKU', 'Revenue', 'Profit', 'Margin']], use_container_width=True)
+        st.dataframe(
+            pa.Table.from_pandas(top_by_category[['Category', 'SKU', 'Transaction Amount', 'Profit', 'Profit Margin']], preserve_index=False),
+            column_config=PRODUCT_COLUMN_CONFIG,
+            use_container_width=True
+        )
+
+# Function to pick the most or least profitable rows within a mask
+def select_by_profit(df, mask, n, largest=True):
+    """Select the n rows with the highest (or lowest) profit among the masked rows
+    
+    Uses np.argpartition on the candidate profits, so only the n picked rows are sorted.
+    
+    Parameters:
+    df (pandas.DataFrame): The data to select from
+    mask (numpy.ndarray): Boolean mask of candidate rows
+    n (int): Number of rows to return
+    largest (bool): Pick the highest profits if True, the lowest otherwise
+    
+    Returns:
+    pandas.DataFrame: The selected rows, ordered by profit
+    """
+    positions = np.flatnonzero(mask)
+    profits = df['Profit'].to_numpy()[positions]
+    if largest:
+        profits = -profits
+    
+    if len(positions) > n:
+        picked = np.argpartition(profits, n)[:n]
+        positions, profits = positions[picked], profits[picked]
+    
+    return df.iloc[positions[np.argsort(profits, kind='stable')]]
 
 # Function to create profitability analysis
 def create_profitability_analysis(df):
@@ -647,90 +953,70 @@ def create_profitability_analysis(df):
     """
     st.markdown("<h2 class='sub-header'>Profitability Analysis</h2>", unsafe_allow_html=True)
     
+    # Column totals in one NumPy pass, reused by the cards
+    total_profit, total_revenue, total_orders = (
+        df[['Profit', 'Transaction Amount', 'Transaction Count']].to_numpy(dtype=float).sum(axis=0)
+    )
+    
     # Profit metrics row
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        total_profit = df['Profit'].sum()
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>${total_profit:,.0f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Total Profit</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        render_card(f"${total_profit:,.0f}", "Total Profit")
     
     with col2:
-        overall_margin = (df['Profit'].sum() / df['Transaction Amount'].sum() * 100) if df['Transaction Amount'].sum() > 0 else 0
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>{overall_margin:.1f}%</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Overall Profit Margin</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        overall_margin = (total_profit / total_revenue * 100) if total_revenue > 0 else 0
+        render_card(f"{overall_margin:.1f}%", "Overall Profit Margin")
     
     with col3:
-        profit_per_order = df['Profit'].sum() / df['Transaction Count'].sum() if df['Transaction Count'].sum() > 0 else 0
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>${profit_per_order:.2f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Profit per Order</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        profit_per_order = total_profit / total_orders if total_orders > 0 else 0
+        render_card(f"${profit_per_order:.2f}", "Profit per Order")
     
     # Margin distribution analysis
     st.markdown("<h3>Profit Margin Distribution by Category</h3>")
     
-    # Group by category and calculate margin statistics
-    category_margins = df.groupby('Category').agg({
-        'Profit Margin': ['mean', 'min', 'max', 'std'],
-        'Transaction Amount': 'sum',
-        'Profit': 'sum'
-    }).reset_index()
-    
-    category_margins.columns = ['Category', 'Avg Margin', 'Min Margin', 'Max Margin', 'Margin StdDev', 'Revenue', 'Profit']
+    # Margin statistics by category from the shared aggregate (cached)
+    margin_cols = ['Category', 'Avg Margin', 'Min Margin', 'Max Margin', 'Margin StdDev', 'Transaction Amount', 'Profit']
+    category_margins = aggregate_by_category(df)[margin_cols].rename(columns={'Transaction Amount': 'Revenue'})
     category_margins['Overall Margin'] = (category_margins['Profit'] / category_margins['Revenue'] * 100).round(1)
     
-    # Sort by overall margin
+    # Sort by overall margin (only the small per-category frame is sorted,
+    # never the row-level data ahead of aggregation)
     category_margins = category_margins.sort_values('Overall Margin', ascending=False)
     
-    # Create a box plot for margin distribution
-    fig = go.Figure()
-    
-    for category in category_margins['Category']:
-        category_df = df[df['Category'] == category]
-        
-        fig.add_trace(go.Box(
-            y=category_df['Profit Margin'],
-            name=category,
-            boxmean=True
-        ))
-    
-    fig.update_layout(
-        title='Profit Margin Distribution by Category',
-        yaxis_title='Profit Margin (%)',
-        showlegend=True
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
+    # Box plot of the margin distribution, ordered like the table (cached figure)
+    st.plotly_chart(build_margin_box(df, tuple(category_margins['Category'])), use_container_width=True)
     
     # Display margin metrics table
     st.markdown("<h3>Category Margin Metrics</h3>")
     
-    # Format for display
-    display_df = category_margins.copy()
-    display_df['Avg Margin'] = display_df['Avg Margin'].apply(lambda x: f"{x:.1f}%")
-    display_df['Min Margin'] = display_df['Min Margin'].apply(lambda x: f"{x:.1f}%")
-    display_df['Max Margin'] = display_df['Max Margin'].apply(lambda x: f"{x:.1f}%")
-    display_df['Margin StdDev'] = display_df['Margin StdDev'].apply(lambda x: f"{x:.2f}")
-    display_df['Overall Margin'] = display_df['Overall Margin'].apply(lambda x: f"{x:.1f}%")
-    display_df['Revenue'] = display_df['Revenue'].apply(lambda x: f"${x:,.0f}")
-    display_df['Profit'] = display_df['Profit'].apply(lambda x: f"${x:,.0f}")
-    
-    st.dataframe(display_df, use_container_width=True)
+    # Numeric columns are formatted by column_config
+    st.dataframe(
+        pa.Table.from_pandas(category_margins, preserve_index=False),
+        column_config={
+            'Avg Margin': st.column_config.NumberColumn(format=PERCENT_FORMAT),
+            'Min Margin': st.column_config.NumberColumn(format=PERCENT_FORMAT),
+            'Max Margin': st.column_config.NumberColumn(format=PERCENT_FORMAT),
+            'Margin StdDev': st.column_config.NumberColumn(format="%.2f"),
+            'Revenue': st.column_config.NumberColumn(format=CURRENCY_FORMAT),
+            'Profit': st.column_config.NumberColumn(format=CURRENCY_FORMAT),
+            'Overall Margin': st.column_config.NumberColumn(format=PERCENT_FORMAT)
+        },
+        use_container_width=True
+    )
     
     # High vs Low margin product analysis
     st.markdown("<h3>High vs Low Margin Products</h3>")
     
     # Define high and low margin thresholds
-    high_margin_threshold = df['Profit Margin'].quantile(0.9)
-    low_margin_threshold = df['Profit Margin'].quantile(0.1)
+    low_margin_threshold, high_margin_threshold = compute_margin_quantiles(df)
+    
+    margins = df['Profit Margin'].to_numpy()
+    high_margin_products = select_by_profit(df, margins >= high_margin_threshold, 5, largest=True)
+    low_margin_products = select_by_profit(df, margins <= low_margin_threshold, 5, largest=False)
     
-    high_margin_products = df[df['Profit Margin'] >= high_margin_threshold].sort_values('Profit', ascending=False).head(5)
-    low_margin_products = df[df['Profit Margin'] <= low_margin_threshold].sort_values('Profit', ascending=True).head(5)
+    # Columns shared by both product tables
+    product_cols = ['SKU', 'Category', 'Transaction Amount', 'Profit', 'Profit Margin']
     
     col1, col2 = st.columns(2)
     
@@ -738,26 +1024,22 @@ def create_profitability_analysis(df):
         st.markdown("<div class='card'>", unsafe_allow_html=True)
         st.markdown("<h4>Top 5 High-Margin Products</h4>", unsafe_allow_html=True)
         
-        # Format for display
-        display_df = high_margin_products.copy()
-        display_df['Revenue'] = display_df['Transaction Amount'].apply(lambda x: f"${x:,.0f}")
-        display_df['Profit'] = display_df['Profit'].apply(lambda x: f"${x:,.0f}")
-        display_df['Margin'] = display_df['Profit Margin'].apply(lambda x: f"{x:.1f}%")
-        
-        st.dataframe(display_df[['SKU', 'Category', 'Revenue', 'Profit', 'Margin']], use_container_width=True)
+        st.dataframe(
+            pa.Table.from_pandas(high_margin_products[product_cols], preserve_index=False),
+            column_config=PRODUCT_COLUMN_CONFIG,
+            use_container_width=True
+        )
         st.markdown("</div>", unsafe_allow_html=True)
     
     with col2:
         st.markdown("<div class='card'>", unsafe_allow_html=True)
         st.markdown("<h4>Bottom 5 Low-Margin Products</h4>", unsafe_allow_html=True)
         
-        # Format for display
-        display_df = low_margin_products.copy()
-        display_df['Revenue'] = display_df['Transaction Amount'].apply(lambda x: f"${x:,.0f}")
-        display_df['Profit'] = display_df['Profit'].apply(lambda x: f"${x:,.0f}")
-        display_df['Margin'] = display_df['Profit Margin'].apply(lambda x: f"{x:.1f}%")
-        
-        st.dataframe(display_df[['SKU', 'Category', 'Revenue', 'Profit', 'Margin']], use_container_width=True)
+        st.dataframe(
+            pa.Table.from_pandas(low_margin_products[product_cols], preserve_index=False),
+            column_config=PRODUCT_COLUMN_CONFIG,
+            use_container_width=True
+        )
         st.markdown("</div>", unsafe_allow_html=True)
 
 # Function to create sales analysis
@@ -769,106 +1051,52 @@ def create_sales_analysis(df):
     """
     st.markdown("<h2 class='sub-header'>Sales Analysis</h2>", unsafe_allow_html=True)
     
+    # Column totals in one NumPy pass, reused by the cards
+    total_revenue, total_orders, total_quantity = (
+        df[['Transaction Amount', 'Transaction Count', 'Transaction Quantity']].to_numpy(dtype=float).sum(axis=0)
+    )
+    
     # Sales metrics row
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_revenue = df['Transaction Amount'].sum()
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>${total_revenue:,.0f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Total Revenue</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        render_card(f"${total_revenue:,.0f}", "Total Revenue")
     
     with col2:
-        total_orders = df['Transaction Count'].sum()
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>{total_orders:,.0f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Total Orders</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        render_card(f"{total_orders:,.0f}", "Total Orders")
     
     with col3:
-        avg_order_value = df['Transaction Amount'].sum() / df['Transaction Count'].sum() if df['Transaction Count'].sum() > 0 else 0
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>${avg_order_value:.2f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Avg Order Value</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
+        render_card(f"${avg_order_value:.2f}", "Avg Order Value")
     
     with col4:
-        total_quantity = df['Transaction Quantity'].sum()
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>{total_quantity:,.0f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Total Items Sold</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        render_card(f"{total_quantity:,.0f}", "Total Items Sold")
     
     # Sales by category
     st.markdown("<h3>Revenue Distribution</h3>")
     
-    # Group by category
-    category_sales = df.groupby('Category').agg({
-        'Transaction Amount': 'sum',
-        'Transaction Count': 'sum',
-        'Transaction Quantity': 'sum'
-    }).reset_index()
+    # Sales totals by category from the shared aggregate (cached)
+    category_sales = aggregate_by_category(df)
     
     # Calculate percentage of total sales
-    total_sales = df['Transaction Amount'].sum()
-    category_sales['Sales Percentage'] = (category_sales['Transaction Amount'] / total_sales * 100).round(1)
-    
-    # Sort by Transaction Amount
-    category_sales = category_sales.sort_values('Transaction Amount', ascending=False)
-    
-    # Create stacked bar chart for comparison of revenue, quantity and orders
-    fig = go.Figure()
-    
-    # Normalize values for comparison
-    category_sales['Normalized Revenue'] = category_sales['Transaction Amount'] / category_sales['Transaction Amount'].sum() * 100
-    category_sales['Normalized Quantity'] = category_sales['Transaction Quantity'] / category_sales['Transaction Quantity'].sum() * 100
-    category_sales['Normalized Orders'] = category_sales['Transaction Count'] / category_sales['Transaction Count'].sum() * 100
-    
-    fig.add_trace(go.Bar(
-        x=category_sales['Category'],
-        y=category_sales['Normalized Revenue'],
-        name='Revenue',
-        marker_color='#3498db'
-    ))
+    category_sales['Sales Percentage'] = (category_sales['Transaction Amount'] / total_revenue * 100).round(1)
     
-    fig.add_trace(go.Bar(
-        x=category_sales['Category'],
-        y=category_sales['Normalized Quantity'],
-        name='Quantity',
-        marker_color='#2ecc71'
-    ))
+    # Grouped bar chart comparing revenue, quantity and orders (cached figure)
+    st.plotly_chart(build_sales_comparison(category_sales), use_container_width=True)
     
-    fig.add_trace(go.Bar(
-        x=category_sales['Category'],
-        y=category_sales['Normalized Orders'],
-        name='Orders',
-        marker_color='#e74c3c'
-    ))
-    
-    fig.update_layout(
-        title='Revenue, Quantity, and Orders by Category (Normalized %)',
-        xaxis_title='Category',
-        yaxis_title='Percentage (%)',
-        barmode='group',
-        bargap=0.15,
-        bargroupgap=0.1
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # Create a treemap for sales breakdown
-    df_copy = df.copy()
-    df_copy['Revenue Label'] = df_copy['Transaction Amount'].apply(lambda x: f"${x:,.0f}")
+    # Create a treemap for sales breakdown from one pre-aggregated row per product;
+    # revenue is formatted in the hover template instead of a label column
+    treemap_df = aggregate_by_product(df)
+    margin_mid = treemap_df['Profit Margin'].median()
     
     fig2 = px.treemap(
-        df_copy,
+        treemap_df,
         path=[px.Constant("All Categories"), 'Category', 'SKU'],
         values='Transaction Amount',
         color='Profit Margin',
-        hover_data=['Revenue Label', 'Transaction Count'],
+        hover_data={'Transaction Amount': ':$,.0f', 'Transaction Count': True},
         color_continuous_scale='RdBu',
-        color_continuous_midpoint=np.median(df_copy['Profit Margin'])
+        color_continuous_midpoint=margin_mid
     )
     
     fig2.update_layout(
@@ -878,15 +1106,13 @@ def create_sales_analysis(df):
     st.plotly_chart(fig2, use_container_width=True)
     
     # If year data is available, show year-over-year comparison
-    if 'Year' in df.columns and len(df['Year'].unique()) > 1:
+    # (Year is categorical, so the number of years is known without scanning the column)
+    n_years = df['Year'].cat.categories.size if 'Year' in df.columns else 0
+    if n_years > 1:
         st.markdown("<h3>Year Over Year Comparison</h3>", unsafe_allow_html=True)
         
-        # Group by year
-        yearly_sales = df.groupby('Year').agg({
-            'Transaction Amount': 'sum',
-            'Transaction Count': 'sum',
-            'Profit': 'sum'
-        }).reset_index()
+        # Group by year (cached)
+        yearly_sales = aggregate_by_year(df)
         
         # Create year over year comparison chart
         fig3 = go.Figure()
@@ -895,7 +1121,7 @@ def create_sales_analysis(df):
             x=yearly_sales['Year'],
             y=yearly_sales['Transaction Amount'],
             name='Revenue',
-            text=yearly_sales['Transaction Amount'].apply(lambda x: f"${x:,.0f}"),
+            text=[f"${x:,.0f}" for x in yearly_sales['Transaction Amount']],
             textposition='auto',
             marker_color='#3498db'
         ))
@@ -904,7 +1130,7 @@ def create_sales_analysis(df):
             x=yearly_sales['Year'],
             y=yearly_sales['Profit'],
             name='Profit',
-            text=yearly_sales['Profit'].apply(lambda x: f"${x:,.0f}"),
+            text=[f"${x:,.0f}" for x in yearly_sales['Profit']],
             textposition='auto',
             marker_color='#2ecc71'
         ))
@@ -918,24 +1144,14 @@ def create_sales_analysis(df):
         
         st.plotly_chart(fig3, use_container_width=True)
 
-# Load data based on selection
-if data_option == "All Time Comparison":
-    # Load all datasets
-    df_2023 = generate_data("2023 Full Year")
-    df_2024 = generate_data("2024 Full Year")
-    df_2025 = generate_data("2025 (up to March 5)")
+# Function to render the overview page
+def render_overview(df, metric_sort):
+    """Render the overview: key metrics, category breakdown and top products
     
-    # Combine datasets
-    df = pd.concat([df_2023, df_2024, df_2025])
-else:
-    df = generate_data(data_option)
-
-# Apply category filter
-if "All" not in category_filter:
-    df = df[df['Category'].isin(category_filter)]
-
-# Render the appropriate view based on selection
-if analysis_type == "Overview":
+    Parameters:
+    df (pandas.DataFrame): The data to display
+    metric_sort (str): The metric to sort products by
+    """
     # Display key metrics
     create_metrics_row(df)
     
@@ -944,23 +1160,22 @@ if analysis_type == "Overview":
     
     # Display top products
     create_product_performance(df, metric_sort)
-    
-elif analysis_type == "Sales Analysis":
-    # Sales Analysis view
-    create_sales_analysis(df)
-    
-elif analysis_type == "Profitability Analysis":
-    # Profitability Analysis view
-    create_profitability_analysis(df)
-    
-elif analysis_type == "Category Performance":
-    # Category Performance view
-    create_category_performance(df)
-    
-elif analysis_type == "Product Performance":
-    # Product Performance view
-    create_product_performance(df, metric_sort)
-    
+
+# Map each analysis view to the function that renders it
+VIEWS = {
+    "Overview": lambda df: render_overview(df, metric_sort),
+    "Sales Analysis": create_sales_analysis,
+    "Profitability Analysis": create_profitability_analysis,
+    "Category Performance": create_category_performance,
+    "Product Performance": lambda df: create_product_performance(df, metric_sort)
+}
+
+# Load data based on selection and apply category filter (cached across reruns)
+df = load_filtered_data(data_option, tuple(sorted(category_filter)))
+
+# Render only the selected view
+VIEWS[analysis_type](df)
+
 # Add a note at the bottom
 st.markdown("---")
 st.markdown("*© 2025 Caleb Alexander - All rights reserved. This data may not be used without authorization.*")
@@ -12,23 +12,29 @@ def load_data(file_path):
     Returns:
     pandas.DataFrame: Processed dataframe
     """
-    try:
-        df = pd.read_csv(file_path)
-        # Perform any necessary data cleaning
-        # Convert string columns to numeric if needed
-        numeric_cols = ['Total Amount', 'Total Quantity', 'Transaction Amount', 'Transaction Count']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-                
-        # Add profit calculation if not present
-        if 'Profit' not in df.columns and 'Cost' in df.columns and 'Transaction Amount' in df.columns:
-            df['Profit'] = df['Transaction Amount'] - df['Cost']
-            
-        return df
-    except Exception as e:
-        print(f"Error loading data: {e}")
-        return pd.DataFrame()
+    # Default C parser: the exports leave blank cells, which it reads as NaN in
+    # float64 columns, so money keeps full precision and counts never hit an
+    # integer cast. Read errors propagate to the caller instead of yielding an
+    # empty frame
+    df = pd.read_csv(file_path)
+    
+    # Coerce stray text in the numeric columns to NaN
+    numeric_cols = ['Total Amount', 'Total Quantity', 'Transaction Amount', 'Transaction Count']
+    for col in numeric_cols:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    
+    # Add profit calculation if not present
+    if 'Profit' not in df.columns and 'Cost' in df.columns and 'Transaction Amount' in df.columns:
+        df['Profit'] = df['Transaction Amount'] - df['Cost']
+    
+    # Profit margin once at load time, 0 where there was no revenue
+    if 'Profit Margin' not in df.columns and 'Profit' in df.columns:
+        amount = df['Transaction Amount'].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            df['Profit Margin'] = np.where(amount > 0, df['Profit'].to_numpy() / amount * 100, 0.0)
+        
+    return df
 
 def filter_data(df, categories=None, start_date=None, end_date=None):
     """
@@ -43,7 +49,9 @@ def filter_data(df, categories=None, start_date=None, end_date=None):
     Returns:
     pandas.DataFrame: Filtered dataframe
     """
-    filtered_df = df.copy()
+    # Boolean indexing already returns a new frame, so no up-front copy is needed;
+    # with no filter the input is returned as is
+    filtered_df = df
     
     if categories is not None and len(categories) > 0 and 'All' not in categories:
         filtered_df = filtered_df[filtered_df['Category'].isin(categories)]
@@ -1,139 +1,236 @@
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+from functools import lru_cache
+
+# Categories and items
+CATEGORIES = {
+    "BEER": ["Hemlock", "CURRENT CAN", "GANSETT", "N/A BEER", "Return Beer", "SIX POINT", "Vermonter Cider"],
+    "COCKTAILS": ["BEAD & FEATHER", "BLACK MANHATTAN", "CARPETBAGGER", "COCKTAIL OF THE DAY", 
+                 "COCKTAIL SHAKEN", "COCKTAIL STIRRED", "Daiquiri", "Gershwin", "Gimlet", 
+                 "Gin & Sin", "HAITIAN DIVORCE", "HOT DRINX", "Manhattan", "Margarita", 
+                 "Martini Gin", "Martini Vodka", "Negroni", "Old Fashioned", "Open Cocktail", 
+                 "Paper Plane", "Penicillin", "Pineapple Daiq", "pineapple daiquiri", 
+                 "POP-UP COCKTAIL", "Rainy Day Dark And Stormy", "SAZERAC COCKTAIL", 
+                 "SHOOTER", "Soda", "SPRITZ", "TITOS MARTINI", "TONE POLICE"],
+    "FOOD": ["BABA GHANO0USH", "BEEF TARTARE", "BITTER SALAD", "BOQUERONES", "BROWNIE", 
+            "Burger", "CARROTS", "CAVIAR DOG", "CHARRED BEETS", "CHICKEM KEBAB", 
+            "CHX SANDWICH", "CROQUETTES", "Doggie", "DUCK RILLETTES", "EXTRA FOCACCIA", 
+            "Extra Patty", "FALAFEL", "FOCACCIA", "FRENCH FRIES", "Fries", "HANDER STEAK", 
+            "HUMMUS", "LAMB KABAB", "LEEK TOAST", "MEZE PLATTER", "MEZE PLATTY", "PLATTY", 
+            "MOUSSE", "MOZZ STICKS", "MUHAMMARA", "NYE TACOS", "OLIVES AND PICKELS", 
+            "Open Food", "Order note", "Pimento Cheese", "Salad", "SAUSAGE", "SEA TROUT", 
+            "Smash - Vegan Patty", "STEAK FRITES", "SUNCHOKES", "TOSTADA", "TZATZIKI", "VCC"],
+    "SPIRITS": ["AMARGO VALLET", "Amaro", "Balvenie", "Bourbon", "BW WHEAT", "CAMPARI", 
+               "CASCUIN TAHONA", "CURRENT CASSIS", "CYNAR", "EL DORADO 12", "ESPOLON", 
+               "Fernet", "Gin", "Hendricks", "Juice", "Macallan 18", "Makers", "Mezcal", 
+               "Michters", "MONTENEGRO", "NONINO", "OLD FORESTER 100", "Open Spirit", 
+               "Rare Breed", "RITTENHOUSE", "Rum", "SAZERAC", "Scotch", "SHOT 4$", 
+               "SHOT 5$", "SHOT 6$", "SHOT 7$", "SHOT 8$", "SHOT 9$", "Spirit", 
+               "SUZE", "Talisker", "Tequila", "TEREMANA REPOSADO", "Tesoro", "Titos", 
+               "Toki", "TULLY", "Vodka", "Wathen's", "ZACAPA"],
+    "WINE": ["BTL Fizzy", "GLS Fizzy", "GLS Red", "GLS Rose", "GLS White", "OPEN WINE"],
+    "N/A": ["Ginger Beer", "Mock Turtleneck", "POP-UP MOCKTAIL"],
+    "Merch": ["Candle 2 oz", "Candle 9oz", "Misc", "GIFT CERTIFICATE"]
+}
+
+# Cost factor range per category as (low, spread)
+COST_RANGES = {
+    "BEER": (0.35, 0.1),       # 35-45%
+    "COCKTAILS": (0.25, 0.1),  # 25-35%
+    "FOOD": (0.4, 0.15),       # 40-55%
+    "SPIRITS": (0.3, 0.1),     # 30-40%
+    "WINE": (0.45, 0.1),       # 45-55%
+    "N/A": (0.15, 0.1),        # 15-25%
+    "Merch": (0.5, 0.2),       # 50-70%
+}
+
+# Flattened item table, built once at import: every item with its category code,
+# plus the cost factor range indexed by category code
+_CATEGORY_NAMES = np.array(list(CATEGORIES), dtype=object)
+_SKUS = np.array([item for items in CATEGORIES.values() for item in items], dtype=object)
+_CAT_CODES = np.repeat(np.arange(len(CATEGORIES)), [len(items) for items in CATEGORIES.values()])
+_COST_LOW = np.array([COST_RANGES[category][0] for category in CATEGORIES], dtype=np.float32)
+_COST_SPREAD = np.array([COST_RANGES[category][1] for category in CATEGORIES], dtype=np.float32)
+
+# Adjustment groups, in frame order, as (sign, amount share, quantity share,
+# draw threshold, max transactions). Shares are integer (numerator, denominator)
+# pairs so the per-row bounds stay on int arrays
+ADJUSTMENT_GROUPS = [
+    (-1, (3, 20), (3, 20), 0.3, 50),    # Discounted: up to 15% / 15%, 70% of items
+    (1, (1, 10), (1, 20), 0.7, 20),     # Offered: up to 10% / 5%, 30% of items
+    (-1, (1, 10), (1, 20), 0.8, 10),    # Loss: up to 10% / 5%, 20% of items
+    (-1, (1, 20), (3, 100), 0.85, 5),   # Returned: up to 5% / 3%, 15% of items
+]
+_ADJ_SIGN = np.array([group[0] for group in ADJUSTMENT_GROUPS], dtype=np.int32)[:, None]
+_ADJ_AMOUNT_SHARE = np.array([group[1] for group in ADJUSTMENT_GROUPS], dtype=np.int32)
+_ADJ_QUANTITY_SHARE = np.array([group[2] for group in ADJUSTMENT_GROUPS], dtype=np.int32)
+
+# Generated numeric columns, in frame order, grouped by dtype
+INT_COLUMNS = [
+    "Total Amount", "Total Quantity", "Total Transaction Count", "Zero Priced Count",
+    "Discounted Amount", "Discounted Quantity", "Discounted Transaction Count",
+    "Offered Amount", "Offered Quantity", "Offered Transaction Count",
+    "Loss Amount", "Loss Quantity", "Loss Transaction Count",
+    "Returned Amount", "Returned Quantity", "Returned Transaction Count",
+    "Transaction Amount", "Transaction Quantity", "Transaction Count"
+]
+FLOAT_COLUMNS = ["Cost", "Profit", "Profit Margin"]
 
 def generate_data(option):
     """
     Generate synthetic data for Pine Bar analytics
     
+    The data is deterministic per option, so each period is generated once and
+    later calls get a copy of the cached frame.
+    
+    Parameters:
+    option (str): Data period option, one of "2023 Full Year", "2024 Full Year", or "2025 (up to March 5)"
+    
+    Returns:
+    pandas.DataFrame: Generated data
+    """
+    # Copy so callers that add or overwrite columns never touch the cached frame
+    return _generate_data(option).copy()
+
+def generate_record_batch(option):
+    """
+    Generate synthetic data for Pine Bar analytics as a single Arrow RecordBatch
+    
+    Built straight from the generated arrays without going through pandas; the
+    numeric columns are zero-copy views and Category/Year are dictionary-encoded.
+    
     Parameters:
     option (str): Data period option, one of "2023 Full Year", "2024 Full Year", or "2025 (up to March 5)"
     
+    Returns:
+    pyarrow.RecordBatch: Generated data, with the same columns as generate_data
+    """
+    skus, codes, int_block, float_block, year = _generate_arrays(option)
+    
+    arrays = [
+        pa.array(skus, type=pa.string()),
+        pa.DictionaryArray.from_arrays(codes.astype(np.int8), pa.array(list(CATEGORIES)))
+    ]
+    arrays += [pa.array(int_block[:, i]) for i in range(len(INT_COLUMNS))]
+    arrays += [pa.array(float_block[:, i]) for i in range(len(FLOAT_COLUMNS))]
+    arrays.append(pa.DictionaryArray.from_arrays(np.zeros(len(skus), dtype=np.int8), pa.array([year])))
+    
+    return pa.RecordBatch.from_arrays(arrays, names=["SKU", "Category"] + INT_COLUMNS + FLOAT_COLUMNS + ["Year"])
+
+@lru_cache(maxsize=4)
+def _generate_data(option):
+    """
+    Build the synthetic data frame for one period (cached; use generate_data)
+    
+    Parameters:
+    option (str): Data period option
+    
     Returns:
     pandas.DataFrame: Generated data
     """
-    # Categories and items
-    categories = {
-        "BEER": ["Hemlock", "CURRENT CAN", "GANSETT", "N/A BEER", "Return Beer", "SIX POINT", "Vermonter Cider"],
-        "COCKTAILS": ["BEAD & FEATHER", "BLACK MANHATTAN", "CARPETBAGGER", "COCKTAIL OF THE DAY", 
-                     "COCKTAIL SHAKEN", "COCKTAIL STIRRED", "Daiquiri", "Gershwin", "Gimlet", 
-                     "Gin & Sin", "HAITIAN DIVORCE", "HOT DRINX", "Manhattan", "Margarita", 
-                     "Martini Gin", "Martini Vodka", "Negroni", "Old Fashioned", "Open Cocktail", 
-                     "Paper Plane", "Penicillin", "Pineapple Daiq", "pineapple daiquiri", 
-                     "POP-UP COCKTAIL", "Rainy Day Dark And Stormy", "SAZERAC COCKTAIL", 
-                     "SHOOTER", "Soda", "SPRITZ", "TITOS MARTINI", "TONE POLICE"],
-        "FOOD": ["BABA GHANO0USH", "BEEF TARTARE", "BITTER SALAD", "BOQUERONES", "BROWNIE", 
-                "Burger", "CARROTS", "CAVIAR DOG", "CHARRED BEETS", "CHICKEM KEBAB", 
-                "CHX SANDWICH", "CROQUETTES", "Doggie", "DUCK RILLETTES", "EXTRA FOCACCIA", 
-                "Extra Patty", "FALAFEL", "FOCACCIA", "FRENCH FRIES", "Fries", "HANDER STEAK", 
-                "HUMMUS", "LAMB KABAB", "LEEK TOAST", "MEZE PLATTER", "MEZE PLATTY", "PLATTY", 
-                "MOUSSE", "MOZZ STICKS", "MUHAMMARA", "NYE TACOS", "OLIVES AND PICKELS", 
-                "Open Food", "Order note", "Pimento Cheese", "Salad", "SAUSAGE", "SEA TROUT", 
-                "Smash - Vegan Patty", "STEAK FRITES", "SUNCHOKES", "TOSTADA", "TZATZIKI", "VCC"],
-        "SPIRITS": ["AMARGO VALLET", "Amaro", "Balvenie", "Bourbon", "BW WHEAT", "CAMPARI", 
-                   "CASCUIN TAHONA", "CURRENT CASSIS", "CYNAR", "EL DORADO 12", "ESPOLON", 
-                   "Fernet", "Gin", "Hendricks", "Juice", "Macallan 18", "Makers", "Mezcal", 
-                   "Michters", "MONTENEGRO", "NONINO", "OLD FORESTER 100", "Open Spirit", 
-                   "Rare Breed", "RITTENHOUSE", "Rum", "SAZERAC", "Scotch", "SHOT 4$", 
-                   "SHOT 5$", "SHOT 6$", "SHOT 7$", "SHOT 8$", "SHOT 9$", "Spirit", 
-                   "SUZE", "Talisker", "Tequila", "TEREMANA REPOSADO", "Tesoro", "Titos", 
-                   "Toki", "TULLY", "Vodka", "Wathen's", "ZACAPA"],
-        "WINE": ["BTL Fizzy", "GLS Fizzy", "GLS Red", "GLS Rose", "GLS White", "OPEN WINE"],
-        "N/A": ["Ginger Beer", "Mock Turtleneck", "POP-UP MOCKTAIL"],
-        "Merch": ["Candle 2 oz", "Candle 9oz", "Misc", "GIFT CERTIFICATE"]
-    }
+    skus, codes, int_block, float_block, year = _generate_arrays(option)
     
+    # Build the frame from one int32 block and one float32 block, so pandas holds
+    # a single consolidated block per dtype instead of one array per column and
+    # no per-row records are transposed or re-inferred. Category stays a plain
+    # string column: the views pass top-N subsets straight to Plotly Express,
+    # which fails on categoricals that carry unused categories
+    df = pd.concat([
+        pd.DataFrame({"SKU": skus, "Category": _CATEGORY_NAMES[codes]}),
+        pd.DataFrame(int_block, columns=INT_COLUMNS, copy=False),
+        pd.DataFrame(float_block, columns=FLOAT_COLUMNS, copy=False)
+    ], axis=1)
+    # One-category Year: int8 codes instead of a repeated string per row
+    df["Year"] = pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8), categories=[year])
+    return df
+
+@lru_cache(maxsize=4)
+def _generate_arrays(option):
+    """
+    Draw the synthetic columns for one period (cached and read-only; shared by the
+    pandas and Arrow builders)
+    
+    Parameters:
+    option (str): Data period option
+    
+    Returns:
+    tuple: (SKU array, category codes, int32 block, float32 block, year label)
+    """
     # Set random seed based on option for consistent results
     if option == "2023 Full Year":
-        np.random.seed(2023)
+        seed = 2023
         n_samples = 150
         year = "2023"
     elif option == "2024 Full Year":
-        np.random.seed(2024)
+        seed = 2024
         n_samples = 180
         year = "2024"
     else:  # 2025 data
-        np.random.seed(2025)
+        seed = 2025
         n_samples = 70
         year = "2025"
     
-    # Create empty dataframe
-    data = []
-    
-    # Generate synthetic data for each category
-    for category, items in categories.items():
-        for item in items:
-            # Only include some items to match the number of samples
-            if np.random.random() > 0.3:
-                # Generate realistic metrics
-                total_amount = np.random.randint(500, 25000)
-                total_quantity = np.random.randint(10, int(total_amount / 10) + 1)
-                transaction_count = np.random.randint(5, min(500, total_quantity + 1))
-                
-                # Calculate other metrics based on total
-                zero_priced = np.random.randint(0, int(total_quantity * 0.05) + 1)
-                disc_amount = -np.random.randint(0, int(total_amount * 0.15) + 1) if np.random.random() > 0.3 else 0
-                disc_quantity = np.random.randint(0, int(total_quantity * 0.15) + 1) if disc_amount < 0 else 0
-                disc_transactions = np.random.randint(0, min(50, disc_quantity + 1)) if disc_quantity > 0 else 0
-                
-                offered_amount = np.random.randint(0, int(total_amount * 0.1) + 1) if np.random.random() > 0.7 else 0
-                offered_quantity = np.random.randint(0, int(total_quantity * 0.05) + 1) if offered_amount > 0 else 0
-                offered_transactions = np.random.randint(0, min(20, offered_quantity + 1)) if offered_quantity > 0 else 0
-                
-                loss_amount = -np.random.randint(0, int(total_amount * 0.1) + 1) if np.random.random() > 0.8 else 0
-                loss_quantity = np.random.randint(0, int(total_quantity * 0.05) + 1) if loss_amount < 0 else 0
-                loss_transactions = np.random.randint(0, min(10, loss_quantity + 1)) if loss_quantity > 0 else 0
-                
-                returned_amount = -np.random.randint(0, int(total_amount * 0.05) + 1) if np.random.random() > 0.85 else 0
-                returned_quantity = np.random.randint(0, int(total_quantity * 0.03) + 1) if returned_amount < 0 else 0
-                returned_transactions = np.random.randint(0, min(5, returned_quantity + 1)) if returned_quantity > 0 else 0
-                
-                # Calculate final transaction values
-                transaction_amount = total_amount + disc_amount + offered_amount + loss_amount + returned_amount
-                transaction_quantity = total_quantity - zero_priced - disc_quantity - offered_quantity - loss_quantity - returned_quantity
-                if transaction_quantity < 0: transaction_quantity = 0
-                
-                # Cost and profit
-                cost_factor = {
-                    "BEER": 0.35 + np.random.random() * 0.1,      # 35-45%
-                    "COCKTAILS": 0.25 + np.random.random() * 0.1, # 25-35%
-                    "FOOD": 0.4 + np.random.random() * 0.15,      # 40-55%
-                    "SPIRITS": 0.3 + np.random.random() * 0.1,    # 30-40%
-                    "WINE": 0.45 + np.random.random() * 0.1,      # 45-55%
-                    "N/A": 0.15 + np.random.random() * 0.1,       # 15-25%
-                    "Merch": 0.5 + np.random.random() * 0.2,      # 50-70%
-                }
-                
-                cost = total_amount * cost_factor[category]
-                profit = transaction_amount - cost
-                profit_margin = (profit / transaction_amount * 100) if transaction_amount > 0 else 0
-                
-                data.append({
-                    "SKU": item, 
-                    "Category": category, 
-                    "Total Amount": total_amount, 
-                    "Total Quantity": total_quantity, 
-                    "Total Transaction Count": transaction_count,
-                    "Zero Priced Count": zero_priced, 
-                    "Discounted Amount": disc_amount, 
-                    "Discounted Quantity": disc_quantity, 
-                    "Discounted Transaction Count": disc_transactions,
-                    "Offered Amount": offered_amount, 
-                    "Offered Quantity": offered_quantity, 
-                    "Offered Transaction Count": offered_transactions,
-                    "Loss Amount": loss_amount, 
-                    "Loss Quantity": loss_quantity, 
-                    "Loss Transaction Count": loss_transactions,
-                    "Returned Amount": returned_amount, 
-                    "Returned Quantity": returned_quantity, 
-                    "Returned Transaction Count": returned_transactions,
-                    "Transaction Amount": transaction_amount, 
-                    "Transaction Quantity": transaction_quantity, 
-                    "Transaction Count": transaction_count,
-                    "Cost": cost, 
-                    "Profit": profit,
-                    "Profit Margin": profit_margin,
-                    "Year": year
-                })
-    
-    df = pd.DataFrame(data)
-    return df
+    # Local PCG64 generator; its integers() broadcasts array bounds for the per-row draws
+    rng = np.random.default_rng(seed)
+    
+    # Only include some items to match the number of samples
+    keep = rng.random(len(_SKUS)) > 0.3
+    skus, codes = _SKUS[keep], _CAT_CODES[keep]
+    n = len(skus)
+    
+    # Generate realistic metrics, one vectorized draw per column
+    # (array upper bounds give each row its own range; int32 holds every count and amount)
+    total_amount = rng.integers(500, 25000, size=n, dtype=np.int32)
+    total_quantity = rng.integers(10, total_amount // 10 + 1, dtype=np.int32)
+    transaction_count = rng.integers(5, np.minimum(500, total_quantity + 1), dtype=np.int32)
+    
+    zero_priced = rng.integers(0, total_quantity // 20 + 1, dtype=np.int32)
+    
+    # Adjustment bounds for all groups at once, one row per group
+    amount_bounds = total_amount * _ADJ_AMOUNT_SHARE[:, :1] // _ADJ_AMOUNT_SHARE[:, 1:] + 1
+    quantity_bounds = total_quantity * _ADJ_QUANTITY_SHARE[:, :1] // _ADJ_QUANTITY_SHARE[:, 1:] + 1
+    
+    # (group, amount/quantity/transactions, row); values are drawn for every row
+    # and zeroed where the group does not apply
+    adjustments = np.empty((len(ADJUSTMENT_GROUPS), 3, n), dtype=np.int32)
+    for g, (_, _, _, threshold, max_transactions) in enumerate(ADJUSTMENT_GROUPS):
+        amount = rng.integers(0, amount_bounds[g], dtype=np.int32) * (rng.random(n) > threshold)
+        quantity = rng.integers(0, quantity_bounds[g], dtype=np.int32) * (amount > 0)
+        transactions = rng.integers(0, np.minimum(max_transactions, quantity + 1), dtype=np.int32) * (quantity > 0)
+        adjustments[g] = amount, quantity, transactions
+    adjustments[:, 0] *= _ADJ_SIGN
+    
+    # Calculate final transaction values
+    transaction_amount = total_amount + adjustments[:, 0].sum(axis=0, dtype=np.int32)
+    transaction_quantity = total_quantity - zero_priced - adjustments[:, 1].sum(axis=0, dtype=np.int32)
+    np.maximum(transaction_quantity, 0, out=transaction_quantity)
+    
+    # Cost and profit, with each category's cost factor range looked up by code
+    cost_factor = _COST_LOW[codes] + rng.random(n, dtype=np.float32) * _COST_SPREAD[codes]
+    
+    # Written straight into the rows of the float32 block with out= ufuncs, so no
+    # full-length intermediates are materialized. Masked margin: rows without
+    # revenue keep their 0 margin and never produce inf/nan
+    float_block = np.zeros((len(FLOAT_COLUMNS), n), dtype=np.float32)
+    cost, profit, profit_margin = float_block
+    has_revenue = transaction_amount > 0
+    np.multiply(total_amount, cost_factor, out=cost)
+    np.subtract(transaction_amount, cost, out=profit)
+    np.multiply(profit, 100, out=profit_margin, where=has_revenue)
+    np.divide(profit_margin, transaction_amount, out=profit_margin, where=has_revenue)
+    
+    # Stack the numeric columns into one block per dtype. Stacking along axis 0 and
+    # transposing keeps each column contiguous, so both pandas blocks and Arrow
+    # arrays can wrap the columns without copying
+    int_block = np.stack([
+        total_amount, total_quantity, transaction_count, zero_priced,
+        *adjustments.reshape(-1, n),
+        transaction_amount, transaction_quantity, transaction_count
+    ]).T
+    float_block = float_block.T
+    
+    # The cached arrays are shared by every caller, so guard them against writes
+    for array in (skus, codes, int_block, float_block):
+        array.flags.writeable = False
+    return skus, codes, int_block, float_block, year
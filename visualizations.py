@@ -3,6 +3,178 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
+from collections import namedtuple
+
+Totals = namedtuple('Totals', ['revenue', 'profit', 'orders', 'quantity'])
+
+# Display formatters, mapped over whole columns
+_fmt_money = "${:,.0f}".format
+_fmt_price = "${:.2f}".format
+_fmt_pct = "{:.1f}%".format
+_fmt_count = "{:,.0f}".format
+_fmt_decimal = "{:.2f}".format
+
+def _hash_dataframe(df):
+    """
+    Cheap content signature used as the st.cache_data key for dataframes
+    
+    Replaces Streamlit's default pickle-based hash with one vectorized row hash.
+    The key is derived from the contents rather than id(df): st.cache_data returns
+    fresh copies and ids are reused between reruns, so an identity key could serve
+    results computed for a different frame.
+    
+    Parameters:
+    df (pandas.DataFrame): The dataframe to hash
+    
+    Returns:
+    tuple: Shape, columns and summed row hashes of the dataframe
+    """
+    return df.shape, tuple(df.columns), int(pd.util.hash_pandas_object(df, index=False).sum())
+
+_DATAFRAME_HASH_FUNCS = {pd.DataFrame: _hash_dataframe}
+
+def _ratio(numerator, denominator, scale=1):
+    """
+    Divide elementwise, leaving 0 where the denominator is zero
+    
+    Parameters:
+    numerator (pandas.Series or numpy.ndarray): Values to divide
+    denominator (pandas.Series, numpy.ndarray or scalar): Divisors
+    scale (float): Factor applied to the quotient, e.g. 100 for percentages
+    
+    Returns:
+    numpy.ndarray: The scaled quotients
+    """
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    return np.divide(numerator * scale, denominator, out=np.zeros_like(numerator), where=denominator != 0)
+
+@st.cache_data(show_spinner=False, hash_funcs=_DATAFRAME_HASH_FUNCS)
+def _category_agg(df):
+    """
+    Aggregate the per-category totals and margin statistics shared by the category views
+    
+    Parameters:
+    df (pandas.DataFrame): The data to aggregate
+    
+    Returns:
+    pandas.DataFrame: Per-category sums, distinct product counts and margin statistics
+    """
+    # Group and count distinct products on integer category codes instead of
+    # hashing every label; the result goes back to plain labels because Plotly
+    # Express fails on categoricals that carry unused categories
+    df = df.assign(Category=df['Category'].astype('category'), SKU=df['SKU'].astype('category'))
+    category_sales = df.groupby('Category', observed=True, sort=False).agg(**{
+        'Transaction Amount': ('Transaction Amount', 'sum'),
+        'Transaction Count': ('Transaction Count', 'sum'),
+        'Transaction Quantity': ('Transaction Quantity', 'sum'),
+        'Profit': ('Profit', 'sum'),
+        'Cost': ('Cost', 'sum'),
+        'SKU': ('SKU', 'nunique'),
+        'Avg Margin': ('Profit Margin', 'mean'),
+        'Min Margin': ('Profit Margin', 'min'),
+        'Max Margin': ('Profit Margin', 'max'),
+        'Margin StdDev': ('Profit Margin', 'std')
+    }).reset_index()
+    return category_sales.astype({'Category': str})
+
+def _totals(df):
+    """
+    Compute the overall totals shown on the metric cards
+    
+    Parameters:
+    df (pandas.DataFrame): The data to total
+    
+    Returns:
+    Totals: Revenue, profit, orders and quantity sums
+    """
+    # One reduction over the four columns instead of a scan per column
+    sums = df[['Transaction Amount', 'Profit', 'Transaction Count', 'Transaction Quantity']].sum()
+    return Totals(*sums.tolist())
+
+@st.cache_data(show_spinner=False, hash_funcs=_DATAFRAME_HASH_FUNCS)
+def _build_margin_box(df, category_order):
+    """
+    Build the profit margin box plot, cached so reruns with the same data skip figure construction
+    
+    Parameters:
+    df (pandas.DataFrame): The data to plot
+    category_order (tuple): Category labels in display order
+    
+    Returns:
+    plotly.graph_objects.Figure: The box plot
+    """
+    # Plotly Express splits the frame into one colored trace per category in a single pass
+    fig = px.box(
+        df,
+        x='Category',
+        y='Profit Margin',
+        color='Category',
+        category_orders={'Category': list(category_order)}
+    )
+    fig.update_traces(boxmean=True)
+    
+    fig.update_layout(
+        title='Profit Margin Distribution by Category',
+        yaxis_title='Profit Margin (%)',
+        showlegend=True
+    )
+    
+    return fig
+
+@st.cache_data(show_spinner=False, hash_funcs=_DATAFRAME_HASH_FUNCS)
+def _build_treemap(df):
+    """
+    Build the revenue treemap, cached so reruns with the same data skip figure construction
+    
+    Parameters:
+    df (pandas.DataFrame): The data to plot
+    
+    Returns:
+    plotly.graph_objects.Figure: The treemap
+    """
+    # One row per product, so Plotly Express has no duplicate leaves to re-aggregate;
+    # the margin of the summed totals weights periods by revenue
+    product_sales = df.groupby(['Category', 'SKU'], observed=True, sort=False).agg(**{
+        'Transaction Amount': ('Transaction Amount', 'sum'),
+        'Transaction Count': ('Transaction Count', 'sum'),
+        'Profit': ('Profit', 'sum')
+    }).reset_index()
+    product_sales['Profit Margin'] = _ratio(product_sales['Profit'], product_sales['Transaction Amount'], 100)
+    
+    fig = px.treemap(
+        product_sales,
+        path=[px.Constant("All Categories"), 'Category', 'SKU'],
+        values='Transaction Amount',
+        color='Profit Margin',
+        hover_data=['Transaction Count'],
+        color_continuous_scale='RdBu',
+        color_continuous_midpoint=product_sales['Profit Margin'].median()
+    )
+    # The browser formats the revenue, so no copy of the frame with a label column is needed
+    fig.update_traces(
+        hovertemplate='%{label}<br>Revenue: $%{value:,.0f}<br>Orders: %{customdata[0]:,.0f}'
+                      '<br>Profit Margin: %{color:.1f}%<extra></extra>'
+    )
+    
+    fig.update_layout(
+        title='Revenue Breakdown by Category and Product'
+    )
+    
+    return fig
+
+def _render_card(value, label):
+    """
+    Render one KPI card as a single markdown element
+    
+    Parameters:
+    value (str): The formatted metric value
+    label (str): The metric label
+    """
+    st.markdown(
+        f"<div class='card'><div class='metric-value'>{value}</div><div class='metric-label'>{label}</div></div>",
+        unsafe_allow_html=True
+    )
 
 def create_metrics_row(df):
     """
@@ -11,39 +183,30 @@ def create_metrics_row(df):
     Parameters:
     df (pandas.DataFrame): The data to display metrics for
     """
+    if df.empty:
+        st.info("No data for current filters.")
+        return
+    
+    totals = _totals(df)
+    
     col1, col2, col3, col4, col5 = st.columns(5)
     
     with col1:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>${df['Transaction Amount'].sum():,.0f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Total Revenue</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        _render_card(f"${totals.revenue:,.0f}", "Total Revenue")
     
     with col2:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>${df['Profit'].sum():,.0f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Total Profit</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        _render_card(f"${totals.profit:,.0f}", "Total Profit")
     
     with col3:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>{df['Transaction Count'].sum():,.0f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Total Orders</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        _render_card(f"{totals.orders:,.0f}", "Total Orders")
     
     with col4:
-        profit_margin = (df['Profit'].sum() / df['Transaction Amount'].sum() * 100) if df['Transaction Amount'].sum() > 0 else 0
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>{profit_margin:.1f}%</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Overall Margin</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        profit_margin = (totals.profit / totals.revenue * 100) if totals.revenue > 0 else 0
+        _render_card(f"{profit_margin:.1f}%", "Overall Margin")
     
     with col5:
-        avg_order = df['Transaction Amount'].sum() / df['Transaction Count'].sum() if df['Transaction Count'].sum() > 0 else 0
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>${avg_order:.2f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Avg Order Value</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        avg_order = totals.revenue / totals.orders if totals.orders > 0 else 0
+        _render_card(f"${avg_order:.2f}", "Avg Order Value")
 
 def create_category_breakdown(df):
     """
@@ -54,16 +217,15 @@ def create_category_breakdown(df):
     """
     st.markdown("<h2 class='sub-header'>Category Overview</h2>", unsafe_allow_html=True)
     
+    if df.empty:
+        st.info("No data for current filters.")
+        return
+    
     # Group by category
-    category_sales = df.groupby('Category').agg({
-        'Transaction Amount': 'sum',
-        'Transaction Count': 'sum',
-        'Profit': 'sum',
-        'Cost': 'sum'
-    }).reset_index()
+    category_sales = _category_agg(df)
     
     # Calculate profit margin percentage for each category
-    category_sales['Profit Margin'] = (category_sales['Profit'] / category_sales['Transaction Amount'] * 100).round(1)
+    category_sales['Profit Margin'] = _ratio(category_sales['Profit'], category_sales['Transaction Amount'], 100).round(1)
     
     # Sort by Transaction Amount
     category_sales = category_sales.sort_values('Transaction Amount', ascending=False)
@@ -79,16 +241,17 @@ def create_category_breakdown(df):
     )
     fig1.update_traces(textposition='inside', textinfo='percent+label')
     
-    # Create horizontal bar chart for category profit
+    # Create horizontal bar chart for category profit, sorting once for bars and labels
+    profit_sorted = category_sales.sort_values('Profit', ascending=True)
     fig2 = px.bar(
-        category_sales.sort_values('Profit', ascending=True),
+        profit_sorted,
         x='Profit',
         y='Category',
         title='Profit by Category',
         orientation='h',
         color='Profit Margin',
         color_continuous_scale='Viridis',
-        text=category_sales.sort_values('Profit', ascending=True)['Profit'].apply(lambda x: f"${x:,.0f}")
+        text=profit_sorted['Profit'].map(_fmt_money)
     )
     fig2.update_traces(textposition='outside')
     
@@ -105,11 +268,11 @@ def create_category_breakdown(df):
     
     # Format the DataFrame for display
     display_df = category_sales.copy()
-    display_df['Revenue'] = display_df['Transaction Amount'].apply(lambda x: f"${x:,.0f}")
-    display_df['Profit'] = display_df['Profit'].apply(lambda x: f"${x:,.0f}")
-    display_df['Margin'] = display_df['Profit Margin'].apply(lambda x: f"{x:.1f}%")
-    display_df['Orders'] = display_df['Transaction Count'].apply(lambda x: f"{x:,.0f}")
-    display_df['Avg Order Value'] = (display_df['Transaction Amount'] / display_df['Transaction Count']).apply(lambda x: f"${x:.2f}")
+    display_df['Revenue'] = display_df['Transaction Amount'].map(_fmt_money)
+    display_df['Profit'] = display_df['Profit'].map(_fmt_money)
+    display_df['Margin'] = display_df['Profit Margin'].map(_fmt_pct)
+    display_df['Orders'] = display_df['Transaction Count'].map(_fmt_count)
+    display_df['Avg Order Value'] = (display_df['Transaction Amount'] / display_df['Transaction Count']).map(_fmt_price)
     
     # Display the formatted DataFrame
     st.dataframe(display_df[['Category', 'Revenue', 'Profit', 'Margin', 'Orders', 'Avg Order Value']], use_container_width=True)
@@ -123,23 +286,21 @@ def create_category_performance(df):
     """
     st.markdown("<h2 class='sub-header'>Category Performance Analysis</h2>", unsafe_allow_html=True)
     
+    if df.empty:
+        st.info("No data for current filters.")
+        return
+    
     # Group by category
-    category_performance = df.groupby('Category').agg({
-        'Transaction Amount': 'sum',
-        'Transaction Count': 'sum',
-        'Transaction Quantity': 'sum',
-        'Profit': 'sum',
-        'Cost': 'sum',
-        'SKU': 'nunique'
-    }).reset_index()
+    category_performance = _category_agg(df)
     
     # Calculate derived metrics
-    category_performance['Profit Margin'] = (category_performance['Profit'] / category_performance['Transaction Amount'] * 100).round(1)
-    category_performance['Avg Order Value'] = (category_performance['Transaction Amount'] / category_performance['Transaction Count']).round(2)
-    category_performance['Avg Items Per Order'] = (category_performance['Transaction Quantity'] / category_performance['Transaction Count']).round(2)
-    category_performance['Revenue Per Item'] = (category_performance['Transaction Amount'] / category_performance['Transaction Quantity']).round(2)
-    category_performance['Revenue Share'] = (category_performance['Transaction Amount'] / df['Transaction Amount'].sum() * 100).round(1)
-    category_performance['Profit Share'] = (category_performance['Profit'] / df['Profit'].sum() * 100).round(1)
+    category_performance['Profit Margin'] = _ratio(category_performance['Profit'], category_performance['Transaction Amount'], 100).round(1)
+    category_performance['Avg Order Value'] = _ratio(category_performance['Transaction Amount'], category_performance['Transaction Count']).round(2)
+    category_performance['Avg Items Per Order'] = _ratio(category_performance['Transaction Quantity'], category_performance['Transaction Count']).round(2)
+    category_performance['Revenue Per Item'] = _ratio(category_performance['Transaction Amount'], category_performance['Transaction Quantity']).round(2)
+    totals = _totals(df)
+    category_performance['Revenue Share'] = _ratio(category_performance['Transaction Amount'], totals.revenue, 100).round(1)
+    category_performance['Profit Share'] = _ratio(category_performance['Profit'], totals.profit, 100).round(1)
     
     # Sort by revenue
     category_performance = category_performance.sort_values('Transaction Amount', ascending=False)
@@ -189,22 +350,44 @@ def create_category_performance(df):
     # Format the DataFrame for display
     st.markdown("<h3>Detailed Category Metrics</h3>", unsafe_allow_html=True)
     
-    display_df = category_performance.copy()
-    display_df['Revenue'] = display_df['Transaction Amount'].apply(lambda x: f"${x:,.0f}")
-    display_df['Profit'] = display_df['Profit'].apply(lambda x: f"${x:,.0f}")
-    display_df['Margin'] = display_df['Profit Margin'].apply(lambda x: f"{x:.1f}%")
-    display_df['Orders'] = display_df['Transaction Count'].apply(lambda x: f"{x:,.0f}")
-    display_df['Items'] = display_df['Transaction Quantity'].apply(lambda x: f"{x:,.0f}")
-    display_df['Products'] = display_df['SKU']
-    display_df['Avg Order'] = display_df['Avg Order Value'].apply(lambda x: f"${x:.2f}")
-    display_df['Rev/Item'] = display_df['Revenue Per Item'].apply(lambda x: f"${x:.2f}")
-    display_df['Rev Share'] = display_df['Revenue Share'].apply(lambda x: f"{x:.1f}%")
-    display_df['Profit Share'] = display_df['Profit Share'].apply(lambda x: f"{x:.1f}%")
-    
-    cols_to_display = ['Category', 'Revenue', 'Profit', 'Margin', 'Orders', 'Items', 
-                       'Products', 'Avg Order', 'Rev/Item', 'Rev Share', 'Profit Share']
-    
-    st.dataframe(display_df[cols_to_display], use_container_width=True)
+    # Keep the metrics numeric and let the Styler format them at render time
+    display_df = category_performance[[
+        'Category', 'Transaction Amount', 'Profit', 'Profit Margin', 'Transaction Count', 'Transaction Quantity',
+        'SKU', 'Avg Order Value', 'Revenue Per Item', 'Revenue Share', 'Profit Share'
+    ]].rename(columns={
+        'Transaction Amount': 'Revenue',
+        'Profit Margin': 'Margin',
+        'Transaction Count': 'Orders',
+        'Transaction Quantity': 'Items',
+        'SKU': 'Products',
+        'Avg Order Value': 'Avg Order',
+        'Revenue Per Item': 'Rev/Item',
+        'Revenue Share': 'Rev Share'
+    })
+    
+    st.dataframe(display_df.style.format({
+        'Revenue': _fmt_money,
+        'Profit': _fmt_money,
+        'Margin': _fmt_pct,
+        'Orders': _fmt_count,
+        'Items': _fmt_count,
+        'Avg Order': _fmt_price,
+        'Rev/Item': _fmt_price,
+        'Rev Share': _fmt_pct,
+        'Profit Share': _fmt_pct
+    }), use_container_width=True)
+
+# Product sort options as (metric, selection method, chart title)
+PRODUCT_SORTS = {
+    "Most Sales": ('Transaction Amount', 'nlargest', 'Top 10 Products by Sales'),
+    "Least Sales": ('Transaction Amount', 'nsmallest', 'Bottom 10 Products by Sales'),
+    "Most Profit": ('Profit', 'nlargest', 'Top 10 Products by Profit'),
+    "Least Profit": ('Profit', 'nsmallest', 'Bottom 10 Products by Profit'),
+    "Highest Margin": ('Profit Margin', 'nlargest', 'Top 10 Products by Profit Margin'),
+    "Lowest Margin": ('Profit Margin', 'nsmallest', 'Bottom 10 Products by Profit Margin'),
+    "Most Orders": ('Transaction Count', 'nlargest', 'Top 10 Products by Order Count'),
+    "Least Orders": ('Transaction Count', 'nsmallest', 'Bottom 10 Products by Order Count')
+}
 
 def create_product_performance(df, metric_sort):
     """
@@ -216,49 +399,17 @@ def create_product_performance(df, metric_sort):
     """
     st.markdown("<h2 class='sub-header'>Product Performance</h2>", unsafe_allow_html=True)
     
-    # Determine sorting based on selected option
-    if metric_sort == "Most Sales":
-        df_sorted = df.sort_values('Transaction Amount', ascending=False).head(10)
-        metric = 'Transaction Amount'
-        title = 'Top 10 Products by Sales'
-        color_values = 'Category'
-    elif metric_sort == "Least Sales":
-        df_sorted = df.sort_values('Transaction Amount', ascending=True).head(10)
-        metric = 'Transaction Amount'
-        title = 'Bottom 10 Products by Sales'
-        color_values = 'Category'
-    elif metric_sort == "Most Profit":
-        df_sorted = df.sort_values('Profit', ascending=False).head(10)
-        metric = 'Profit'
-        title = 'Top 10 Products by Profit'
-        color_values = 'Category'
-    elif metric_sort == "Least Profit":
-        df_sorted = df.sort_values('Profit', ascending=True).head(10)
-        metric = 'Profit'
-        title = 'Bottom 10 Products by Profit'
-        color_values = 'Category'
-    elif metric_sort == "Highest Margin":
-        df_sorted = df.sort_values('Profit Margin', ascending=False).head(10)
-        metric = 'Profit Margin'
-        title = 'Top 10 Products by Profit Margin'
-        color_values = 'Profit Margin'
-    elif metric_sort == "Lowest Margin":
-        df_sorted = df.sort_values('Profit Margin', ascending=True).head(10)
-        metric = 'Profit Margin'
-        title = 'Bottom 10 Products by Profit Margin'
-        color_values = 'Profit Margin'
-    elif metric_sort == "Most Orders":
-        df_sorted = df.sort_values('Transaction Count', ascending=False).head(10)
-        metric = 'Transaction Count'
-        title = 'Top 10 Products by Order Count'
-        color_values = 'Category'
-    else:  # Least Orders
-        df_sorted = df.sort_values('Transaction Count', ascending=True).head(10)
-        metric = 'Transaction Count'
-        title = 'Bottom 10 Products by Order Count'
-        color_values = 'Category'
-    
-    # Create horizontal bar chart
+    if df.empty:
+        st.info("No data for current filters.")
+        return
+    
+    # Determine sorting based on selected option; a partial top-10 selection
+    # instead of sorting the whole frame
+    metric, how, title = PRODUCT_SORTS.get(metric_sort, PRODUCT_SORTS["Least Orders"])
+    df_sorted = getattr(df, how)(10, metric)
+    color_values = 'Profit Margin' if metric == 'Profit Margin' else 'Category'
+    
+    # Create horizontal bar chart; the bar labels are formatted by Plotly's texttemplate in the browser
     if metric == 'Profit Margin':
         fig = px.bar(
             df_sorted,
@@ -267,11 +418,11 @@ def create_product_performance(df, metric_sort):
             title=title,
             orientation='h',
             color=color_values,
-            text=df_sorted[metric].apply(lambda x: f"{x:.1f}%"),
+            text=metric,
             color_continuous_scale='Viridis',
             hover_data=['Category', 'Transaction Amount', 'Profit']
         )
-        fig.update_traces(textposition='outside')
+        fig.update_traces(texttemplate='%{x:.1f}%', textposition='outside')
     elif metric == 'Transaction Count':
         fig = px.bar(
             df_sorted,
@@ -280,11 +431,11 @@ def create_product_performance(df, metric_sort):
             title=title,
             orientation='h',
             color=color_values,
-            text=df_sorted[metric],
+            text=metric,
             color_discrete_sequence=px.colors.qualitative.Bold,
             hover_data=['Category', 'Transaction Amount', 'Profit']
         )
-        fig.update_traces(textposition='outside')
+        fig.update_traces(texttemplate='%{x:,.0f}', textposition='outside')
     else:
         fig = px.bar(
             df_sorted,
@@ -293,11 +444,11 @@ def create_product_performance(df, metric_sort):
             title=title,
             orientation='h',
             color=color_values,
-            text=df_sorted[metric].apply(lambda x: f"${x:,.0f}"),
+            text=metric,
             color_discrete_sequence=px.colors.qualitative.Bold,
             hover_data=['Category', 'Transaction Count', 'Profit Margin']
         )
-        fig.update_traces(textposition='outside')
+        fig.update_traces(texttemplate='$%{x:,.0f}', textposition='outside')
     
     st.plotly_chart(fig, use_container_width=True)
     
@@ -305,25 +456,31 @@ def create_product_performance(df, metric_sort):
     with st.expander("View Detailed Product Data"):
         # Format columns for display
         display_df = df_sorted.copy()
-        display_df['Revenue'] = display_df['Transaction Amount'].apply(lambda x: f"${x:,.0f}")
-        display_df['Profit'] = display_df['Profit'].apply(lambda x: f"${x:,.0f}")
-        display_df['Margin'] = display_df['Profit Margin'].apply(lambda x: f"{x:.1f}%")
+        display_df['Revenue'] = display_df['Transaction Amount'].map(_fmt_money)
+        display_df['Profit'] = display_df['Profit'].map(_fmt_money)
+        display_df['Margin'] = display_df['Profit Margin'].map(_fmt_pct)
         display_df['Orders'] = display_df['Transaction Count']
-        display_df['Avg Order Value'] = (display_df['Transaction Amount'] / display_df['Transaction Count']).apply(lambda x: f"${x:.2f}")
+        display_df['Avg Order Value'] = (display_df['Transaction Amount'] / display_df['Transaction Count']).map(_fmt_price)
         
         st.dataframe(display_df[['SKU', 'Category', 'Revenue', 'Profit', 'Margin', 'Orders', 'Avg Order Value']], use_container_width=True)
     
     # Additional product insights
     st.markdown("<h3>Product Insights</h3>", unsafe_allow_html=True)
     
-    # Get top product within each category
-    top_by_category = df.sort_values('Transaction Amount', ascending=False).groupby('Category').first().reset_index()
+    # Get top product within each category: the first row per category after the
+    # revenue sort, listed by category name
+    top_by_category = (
+        df.sort_values('Transaction Amount', ascending=False)
+        .drop_duplicates(subset='Category', keep='first')
+        .sort_values('Category')
+        .reset_index(drop=True)
+    )
     
     # Format for display
     top_category_df = top_by_category.copy()
-    top_category_df['Revenue'] = top_category_df['Transaction Amount'].apply(lambda x: f"${x:,.0f}")
-    top_category_df['Profit'] = top_category_df['Profit'].apply(lambda x: f"${x:,.0f}")
-    top_category_df['Margin'] = top_category_df['Profit Margin'].apply(lambda x: f"{x:.1f}%")
+    top_category_df['Revenue'] = top_category_df['Transaction Amount'].map(_fmt_money)
+    top_category_df['Profit'] = top_category_df['Profit'].map(_fmt_money)
+    top_category_df['Margin'] = top_category_df['Profit Margin'].map(_fmt_pct)
     
     with st.expander("Top Selling Product by Category"):
         st.dataframe(top_category_df[['Category', 'SKU', 'Revenue', 'Profit', 'Margin']], use_container_width=True)
@@ -337,63 +494,40 @@ def create_profitability_analysis(df):
     """
     st.markdown("<h2 class='sub-header'>Profitability Analysis</h2>", unsafe_allow_html=True)
     
+    if df.empty:
+        st.info("No data for current filters.")
+        return
+    
     # Profit metrics row
+    totals = _totals(df)
+    
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        total_profit = df['Profit'].sum()
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>${total_profit:,.0f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Total Profit</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        _render_card(f"${totals.profit:,.0f}", "Total Profit")
     
     with col2:
-        overall_margin = (df['Profit'].sum() / df['Transaction Amount'].sum() * 100) if df['Transaction Amount'].sum() > 0 else 0
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>{overall_margin:.1f}%</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Overall Profit Margin</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        overall_margin = (totals.profit / totals.revenue * 100) if totals.revenue > 0 else 0
+        _render_card(f"{overall_margin:.1f}%", "Overall Profit Margin")
     
     with col3:
-        profit_per_order = df['Profit'].sum() / df['Transaction Count'].sum() if df['Transaction Count'].sum() > 0 else 0
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>${profit_per_order:.2f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Profit per Order</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        profit_per_order = totals.profit / totals.orders if totals.orders > 0 else 0
+        _render_card(f"${profit_per_order:.2f}", "Profit per Order")
     
     # Margin distribution analysis
     st.markdown("<h3>Profit Margin Distribution by Category</h3>")
     
     # Group by category and calculate margin statistics
-    category_margins = df.groupby('Category').agg({
-        'Profit Margin': ['mean', 'min', 'max', 'std'],
-        'Transaction Amount': 'sum',
-        'Profit': 'sum'
-    }).reset_index()
-    
-    category_margins.columns = ['Category', 'Avg Margin', 'Min Margin', 'Max Margin', 'Margin StdDev', 'Revenue', 'Profit']
-    category_margins['Overall Margin'] = (category_margins['Profit'] / category_margins['Revenue'] * 100).round(1)
+    category_margins = _category_agg(df)[[
+        'Category', 'Avg Margin', 'Min Margin', 'Max Margin', 'Margin StdDev', 'Transaction Amount', 'Profit'
+    ]].rename(columns={'Transaction Amount': 'Revenue'})
+    category_margins['Overall Margin'] = _ratio(category_margins['Profit'], category_margins['Revenue'], 100).round(1)
     
     # Sort by overall margin
     category_margins = category_margins.sort_values('Overall Margin', ascending=False)
     
     # Create a box plot for margin distribution
-    fig = go.Figure()
-    
-    for category in category_margins['Category']:
-        category_df = df[df['Category'] == category]
-        
-        fig.add_trace(go.Box(
-            y=category_df['Profit Margin'],
-            name=category,
-            boxmean=True
-        ))
-    
-    fig.update_layout(
-        title='Profit Margin Distribution by Category',
-        yaxis_title='Profit Margin (%)',
-        showlegend=True
-    )
+    fig = _build_margin_box(df, tuple(category_margins['Category']))
     
     st.plotly_chart(fig, use_container_width=True)
     
@@ -402,25 +536,26 @@ def create_profitability_analysis(df):
     
     # Format for display
     display_df = category_margins.copy()
-    display_df['Avg Margin'] = display_df['Avg Margin'].apply(lambda x: f"{x:.1f}%")
-    display_df['Min Margin'] = display_df['Min Margin'].apply(lambda x: f"{x:.1f}%")
-    display_df['Max Margin'] = display_df['Max Margin'].apply(lambda x: f"{x:.1f}%")
-    display_df['Margin StdDev'] = display_df['Margin StdDev'].apply(lambda x: f"{x:.2f}")
-    display_df['Overall Margin'] = display_df['Overall Margin'].apply(lambda x: f"{x:.1f}%")
-    display_df['Revenue'] = display_df['Revenue'].apply(lambda x: f"${x:,.0f}")
-    display_df['Profit'] = display_df['Profit'].apply(lambda x: f"${x:,.0f}")
+    display_df['Avg Margin'] = display_df['Avg Margin'].map(_fmt_pct)
+    display_df['Min Margin'] = display_df['Min Margin'].map(_fmt_pct)
+    display_df['Max Margin'] = display_df['Max Margin'].map(_fmt_pct)
+    display_df['Margin StdDev'] = display_df['Margin StdDev'].map(_fmt_decimal)
+    display_df['Overall Margin'] = display_df['Overall Margin'].map(_fmt_pct)
+    display_df['Revenue'] = display_df['Revenue'].map(_fmt_money)
+    display_df['Profit'] = display_df['Profit'].map(_fmt_money)
     
     st.dataframe(display_df, use_container_width=True)
     
     # High vs Low margin product analysis
     st.markdown("<h3>High vs Low Margin Products</h3>")
     
-    # Define high and low margin thresholds
-    high_margin_threshold = df['Profit Margin'].quantile(0.9)
-    low_margin_threshold = df['Profit Margin'].quantile(0.1)
+    # Define high and low margin thresholds in one selection pass, and mask with
+    # plain arrays to skip index alignment
+    margins = df['Profit Margin'].to_numpy()
+    low_margin_threshold, high_margin_threshold = np.percentile(margins, [10, 90])
     
-    high_margin_products = df[df['Profit Margin'] >= high_margin_threshold].sort_values('Profit', ascending=False).head(5)
-    low_margin_products = df[df['Profit Margin'] <= low_margin_threshold].sort_values('Profit', ascending=True).head(5)
+    high_margin_products = df[margins >= high_margin_threshold].sort_values('Profit', ascending=False).head(5)
+    low_margin_products = df[margins <= low_margin_threshold].sort_values('Profit', ascending=True).head(5)
     
     col1, col2 = st.columns(2)
     
@@ -430,9 +565,9 @@ def create_profitability_analysis(df):
         
         # Format for display
         display_df = high_margin_products.copy()
-        display_df['Revenue'] = display_df['Transaction Amount'].apply(lambda x: f"${x:,.0f}")
-        display_df['Profit'] = display_df['Profit'].apply(lambda x: f"${x:,.0f}")
-        display_df['Margin'] = display_df['Profit Margin'].apply(lambda x: f"{x:.1f}%")
+        display_df['Revenue'] = display_df['Transaction Amount'].map(_fmt_money)
+        display_df['Profit'] = display_df['Profit'].map(_fmt_money)
+        display_df['Margin'] = display_df['Profit Margin'].map(_fmt_pct)
         
         st.dataframe(display_df[['SKU', 'Category', 'Revenue', 'Profit', 'Margin']], use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
@@ -443,9 +578,9 @@ def create_profitability_analysis(df):
         
         # Format for display
         display_df = low_margin_products.copy()
-        display_df['Revenue'] = display_df['Transaction Amount'].apply(lambda x: f"${x:,.0f}")
-        display_df['Profit'] = display_df['Profit'].apply(lambda x: f"${x:,.0f}")
-        display_df['Margin'] = display_df['Profit Margin'].apply(lambda x: f"{x:.1f}%")
+        display_df['Revenue'] = display_df['Transaction Amount'].map(_fmt_money)
+        display_df['Profit'] = display_df['Profit'].map(_fmt_money)
+        display_df['Margin'] = display_df['Profit Margin'].map(_fmt_pct)
         
         st.dataframe(display_df[['SKU', 'Category', 'Revenue', 'Profit', 'Margin']], use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
@@ -459,50 +594,36 @@ def create_sales_analysis(df):
     """
     st.markdown("<h2 class='sub-header'>Sales Analysis</h2>", unsafe_allow_html=True)
     
+    if df.empty:
+        st.info("No data for current filters.")
+        return
+    
     # Sales metrics row
+    totals = _totals(df)
+    
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_revenue = df['Transaction Amount'].sum()
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>${total_revenue:,.0f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Total Revenue</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        _render_card(f"${totals.revenue:,.0f}", "Total Revenue")
     
     with col2:
-        total_orders = df['Transaction Count'].sum()
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>{total_orders:,.0f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Total Orders</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        _render_card(f"{totals.orders:,.0f}", "Total Orders")
     
     with col3:
-        avg_order_value = df['Transaction Amount'].sum() / df['Transaction Count'].sum() if df['Transaction Count'].sum() > 0 else 0
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>${avg_order_value:.2f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Avg Order Value</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        avg_order_value = totals.revenue / totals.orders if totals.orders > 0 else 0
+        _render_card(f"${avg_order_value:.2f}", "Avg Order Value")
     
     with col4:
-        total_quantity = df['Transaction Quantity'].sum()
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown(f"<div class='metric-value'>{total_quantity:,.0f}</div>", unsafe_allow_html=True)
-        st.markdown("<div class='metric-label'>Total Items Sold</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        _render_card(f"{totals.quantity:,.0f}", "Total Items Sold")
     
     # Sales by category
     st.markdown("<h3>Revenue Distribution</h3>")
     
     # Group by category
-    category_sales = df.groupby('Category').agg({
-        'Transaction Amount': 'sum',
-        'Transaction Count': 'sum',
-        'Transaction Quantity': 'sum'
-    }).reset_index()
+    category_sales = _category_agg(df)
     
     # Calculate percentage of total sales
-    total_sales = df['Transaction Amount'].sum()
-    category_sales['Sales Percentage'] = (category_sales['Transaction Amount'] / total_sales * 100).round(1)
+    category_sales['Sales Percentage'] = _ratio(category_sales['Transaction Amount'], totals.revenue, 100).round(1)
     
     # Sort by Transaction Amount
     category_sales = category_sales.sort_values('Transaction Amount', ascending=False)
@@ -511,9 +632,9 @@ def create_sales_analysis(df):
     fig = go.Figure()
     
     # Normalize values for comparison
-    category_sales['Normalized Revenue'] = category_sales['Transaction Amount'] / category_sales['Transaction Amount'].sum() * 100
-    category_sales['Normalized Quantity'] = category_sales['Transaction Quantity'] / category_sales['Transaction Quantity'].sum() * 100
-    category_sales['Normalized Orders'] = category_sales['Transaction Count'] / category_sales['Transaction Count'].sum() * 100
+    category_sales['Normalized Revenue'] = _ratio(category_sales['Transaction Amount'], totals.revenue, 100)
+    category_sales['Normalized Quantity'] = _ratio(category_sales['Transaction Quantity'], totals.quantity, 100)
+    category_sales['Normalized Orders'] = _ratio(category_sales['Transaction Count'], totals.orders, 100)
     
     fig.add_trace(go.Bar(
         x=category_sales['Category'],
@@ -548,22 +669,7 @@ def create_sales_analysis(df):
     st.plotly_chart(fig, use_container_width=True)
     
     # Create a treemap for sales breakdown
-    df_copy = df.copy()
-    df_copy['Revenue Label'] = df_copy['Transaction Amount'].apply(lambda x: f"${x:,.0f}")
-    
-    fig2 = px.treemap(
-        df_copy,
-        path=[px.Constant("All Categories"), 'Category', 'SKU'],
-        values='Transaction Amount',
-        color='Profit Margin',
-        hover_data=['Revenue Label', 'Transaction Count'],
-        color_continuous_scale='RdBu',
-        color_continuous_midpoint=np.median(df_copy['Profit Margin'])
-    )
-    
-    fig2.update_layout(
-        title='Revenue Breakdown by Category and Product'
-    )
+    fig2 = _build_treemap(df)
     
     st.plotly_chart(fig2, use_container_width=True)
     
@@ -572,7 +678,7 @@ def create_sales_analysis(df):
         st.markdown("<h3>Year Over Year Comparison</h3>", unsafe_allow_html=True)
         
         # Group by year
-        yearly_sales = df.groupby('Year').agg({
+        yearly_sales = df.groupby('Year', observed=True).agg({
             'Transaction Amount': 'sum',
             'Transaction Count': 'sum',
             'Profit': 'sum'
@@ -585,7 +691,7 @@ def create_sales_analysis(df):
             x=yearly_sales['Year'],
             y=yearly_sales['Transaction Amount'],
             name='Revenue',
-            text=yearly_sales['Transaction Amount'].apply(lambda x: f"${x:,.0f}"),
+            text=yearly_sales['Transaction Amount'].map(_fmt_money),
             textposition='auto',
             marker_color='#3498db'
         ))
@@ -594,7 +700,7 @@ def create_sales_analysis(df):
             x=yearly_sales['Year'],
             y=yearly_sales['Profit'],
             name='Profit',
-            text=yearly_sales['Profit'].apply(lambda x: f"${x:,.0f}"),
+            text=yearly_sales['Profit'].map(_fmt_money),
             textposition='auto',
             marker_color='#2ecc71'
         ))